@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Created: 18 October 2026
+#
+# Copyright 2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Benchmark of the ORB, the distributed lock and the peers.
+
+Starts a name service and the peers needed by the scenarios in this
+process, runs the scenarios and writes their results as JSON, so that
+the results of different runs can be compared.
+
+"""
+
+import sys
+import json
+import time
+import platform
+import argparse
+
+sys.path.append("../modules")
+from Benchmark import scenarios
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """Benchmark of the ORB."""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "scenarios", metavar="SCENARIO", nargs="*",
+    default=sorted(scenarios.scenarios.keys()),
+    help="Scenarios to run, among: {}. Default: all of them.".format(
+        ", ".join(sorted(scenarios.scenarios.keys())))
+)
+parser.add_argument(
+    "-n", "--count", metavar="N", dest="count", type=int,
+    help="Number of calls made by each client. Default: depends on the "
+         "scenario."
+)
+parser.add_argument(
+    "-s", "--size", metavar="BYTES", dest="size", type=int, default=2 ** 20,
+    help="Size of the large payloads. Default: 1048576."
+)
+parser.add_argument(
+    "-c", "--clients", metavar="N", dest="clients", type=int, default=8,
+    help="Number of concurrent clients. Default: 8."
+)
+parser.add_argument(
+    "-N", "--peers", metavar="N", dest="peers", type=int, default=4,
+    help="Number of peers for fan-out and token passing. Default: 4."
+)
+parser.add_argument(
+    "-T", "--transport", metavar="TRANSPORT", dest="transport",
+    default="tcp", choices=("tcp", "unix", "inproc"),
+    help="Transport between the objects: tcp, unix or inproc. "
+         "Default: tcp."
+)
+parser.add_argument(
+    "-w", "--workers", metavar="N", dest="workers", type=int, default=0,
+    help="Serve requests with a pool of N worker threads instead of one "
+         "thread per connection. Default: 0 (one thread per connection)."
+)
+parser.add_argument(
+    "-a", "--allocations", action="store_true", dest="allocations",
+    default=False,
+    help="Also report the peak of the memory allocated by each scenario. "
+         "Slows the calls down."
+)
+parser.add_argument(
+    "-o", "--output", metavar="FILE", dest="output",
+    help="Write the results to FILE instead of the standard output."
+)
+opts = parser.parse_args()
+
+for name in opts.scenarios:
+    if name not in scenarios.scenarios:
+        parser.error("unknown scenario: '{}'".format(name))
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+options = {
+    "size": opts.size,
+    "clients": opts.clients,
+    "peers": opts.peers,
+    "allocations": opts.allocations
+}
+if opts.count is not None:
+    options["count"] = opts.count
+
+cluster = scenarios.Cluster(opts.transport, workers=opts.workers)
+results = {
+    "time": time.time(),
+    "python": platform.python_version(),
+    "transport": opts.transport,
+    "workers": opts.workers,
+    "scenarios": {}
+}
+try:
+    for name in opts.scenarios:
+        sys.stderr.write("Running {}...\n".format(name))
+        results["scenarios"][name] = scenarios.scenarios[name](cluster,
+                                                                **options)
+finally:
+    cluster.close()
+
+if opts.output is not None:
+    with open(opts.output, "w") as f:
+        json.dump(results, f, indent=4, sort_keys=True)
+else:
+    print(json.dumps(results, indent=4, sort_keys=True))
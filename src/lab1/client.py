@@ -35,8 +35,13 @@ Client for a fortune database. It reads a random fortune from the database.\
 """
 parser = argparse.ArgumentParser(description=description)
 parser.add_argument(
-    "-w", "--write", metavar="FORTUNE", dest="fortune",
-    help="Write a new fortune to the database."
+    "-w", "--write", metavar="FORTUNE", dest="fortunes", action="append",
+    help="Write a new fortune to the database. Repeat to write several "
+         "fortunes in a single request."
+)
+parser.add_argument(
+    "-n", "--count", metavar="N", dest="count", type=int, default=1,
+    help="Read N different fortunes in a single request."
 )
 parser.add_argument(
     "-i", "--interactive", action="store_true", dest="interactive",
@@ -95,6 +100,11 @@ class DatabaseProxy(object):
         returnedJson = self.create_socket(jsonData)
         return self.fix_json(returnedJson)
 
+    def read_many(self, n):
+        jsonData = {"method" : "read_many", "args" : n}
+        returnedJson = self.create_socket(jsonData)
+        return self.fix_json(returnedJson)
+
 
     def write(self, fortune):
         #
@@ -104,6 +114,11 @@ class DatabaseProxy(object):
         returnedJson = self.create_socket(jsonData)
         return self.fix_json(returnedJson)
 
+    def write_many(self, fortunes):
+        jsonData = {"method" : "write_many", "args" : list(fortunes)}
+        returnedJson = self.create_socket(jsonData)
+        return self.fix_json(returnedJson)
+
 
 # -----------------------------------------------------------------------------
 # The main program
@@ -114,8 +129,15 @@ db = DatabaseProxy(server_address)
 
 if not opts.interactive:
     # Run in the normal mode.
-    if opts.fortune is not None:
-        db.write(opts.fortune)
+    if opts.fortunes is not None:
+        if len(opts.fortunes) == 1:
+            db.write(opts.fortunes[0])
+        else:
+            db.write_many(opts.fortunes)
+    elif opts.count > 1:
+        for fortune in db.read_many(opts.count):
+            print(fortune)
+            print("%")
     else:
         print(db.read())
 
@@ -11,6 +11,7 @@
 
 """Server that serves clients trying to work with the database."""
 
+import os
 import threading
 import socket
 import json
@@ -21,6 +22,7 @@ import sys
 sys.path.append("../modules")
 from Server.database import Database
 from Server.Lock.readWriteLock import ReadWriteLock
+from Server.Lock.processReadWriteLock import ProcessReadWriteLock
 
 # -----------------------------------------------------------------------------
 # Initialize and read the command line arguments
@@ -44,9 +46,28 @@ parser.add_argument(
     "-f", "--file", metavar="FILE", dest="file", default="dbs/fortune.db",
     help="Set the database file. Default: dbs/fortune.db."
 )
+parser.add_argument(
+    "-P", "--processes", metavar="N", dest="processes", type=int, default=1,
+    help="Serve the clients from N processes sharing the database file, "
+         "to use several cores. Default: 1."
+)
+parser.add_argument(
+    "-l", "--log", action="store_true", dest="log", default=False,
+    help="Keep the database file open as a log, and answer the writes once "
+         "they are on disk. Concurrent writes are saved together."
+)
+parser.add_argument(
+    "-d", "--commit-delay", metavar="SECONDS", dest="commit_delay",
+    type=float, default=0.0,
+    help="With --log, wait up to SECONDS for more writes to save together. "
+         "Default: 0."
+)
 opts = parser.parse_args()
 
 db_file = opts.file
+processes = opts.processes
+log = opts.log
+commit_delay = opts.commit_delay
 server_address = ("", opts.port)
 
 # -----------------------------------------------------------------------------
@@ -58,9 +79,16 @@ class Server(object):
 
     """Class that provides synchronous access to the database."""
 
-    def __init__(self, db_file):
-        self.db = Database(db_file)
-        self.rwlock = ReadWriteLock()
+    def __init__(self, db_file, processes=1, log=False, commit_delay=0.0):
+        if processes > 1:
+            # The processes see each other's writes through the file,
+            # which they lock while using it.
+            self.db = Database(db_file, shared=True, log=log,
+                               commit_delay=commit_delay)
+            self.rwlock = ProcessReadWriteLock(db_file)
+        else:
+            self.db = Database(db_file, log=log, commit_delay=commit_delay)
+            self.rwlock = ReadWriteLock()
 
     # Public methods
 
@@ -73,15 +101,35 @@ class Server(object):
         self.rwlock.read_release()
         return result
 
+    def read_many(self, n):
+        self.rwlock.read_acquire()
+        try:
+            return self.db.read_many(n)
+        finally:
+            self.rwlock.read_release()
+
     def write(self, fortune):
         #
         # Your code here.
         #
+        if self.db.log is not None:
+            # The log orders the writes itself, and saves concurrent
+            # ones together: they must not wait for each other here.
+            return self.db.write(fortune)
         self.rwlock.write_acquire()
         result = self.db.write(fortune)
         self.rwlock.write_release()
         return result
 
+    def write_many(self, fortunes):
+        if self.db.log is not None:
+            return self.db.write_many(fortunes)
+        self.rwlock.write_acquire()
+        try:
+            return self.db.write_many(fortunes)
+        finally:
+            self.rwlock.write_release()
+
 class Request(threading.Thread):
 
     """ Class for handling incoming requests.
@@ -128,6 +176,11 @@ class Request(threading.Thread):
                 method_result = self.db_server.read()
             elif request.get("method") == "write":
                 method_result = self.db_server.write(request.get("args"))
+            elif request.get("method") == "read_many":
+                method_result = self.db_server.read_many(request.get("args"))
+            elif request.get("method") == "write_many":
+                method_result = self.db_server.write_many(
+                    request.get("args"))
             result = {
                 "result": method_result
             }
@@ -172,12 +225,17 @@ print("Listening to: {}:{}".format(socket.gethostname(), opts.port))
 with open("srv_address.tmp", "w") as f:
     f.write("{}:{}\n".format(socket.gethostname(), opts.port))
 
-sync_db = Server(db_file)
+sync_db = Server(db_file, processes, log, commit_delay)
 
 server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 server.bind(server_address)
 server.listen(1)
 
+# The other processes accept connections on the same socket.
+for i in range(processes - 1):
+    if os.fork() == 0:
+        break
+
 print("Press Ctrl-C to stop the server...")
 
 try:
@@ -22,6 +22,7 @@ from Common.nameServiceLocation import name_service_address
 from Common.objectType import object_type
 
 from Server.peerList import PeerList
+from Server.failureDetector import FailureDetector
 from Server.Lock.distributedLock import DistributedLock
 
 # -----------------------------------------------------------------------------
@@ -62,21 +63,27 @@ class Client(orb.Peer):
         orb.Peer.__init__(self, local_address, ns_address, client_type)
         self.peer_list = PeerList(self)
         self.distributed_lock = DistributedLock(self, self.peer_list)
+        self.failure_detector = FailureDetector(self, self.peer_list)
         self.dispatched_calls = {
+            "check":              orb.control(self.check),
             "display_peers":      self.peer_list.display_peers,
             "acquire":            self.distributed_lock.acquire,
             "release":            self.distributed_lock.release,
-            "request_token":      self.distributed_lock.request_token,
-            "obtain_token":       self.distributed_lock.obtain_token,
+            "request_token":      orb.control(
+                self.distributed_lock.request_token),
+            "obtain_token":       orb.control(
+                self.distributed_lock.obtain_token),
             "display_status":     self.distributed_lock.display_status
         }
         orb.Peer.start(self)
         self.peer_list.initialize()
         self.distributed_lock.initialize()
+        self.failure_detector.start()
 
     # Public methods
 
     def destroy(self):
+        self.failure_detector.stop()
         orb.Peer.destroy(self)
         self.distributed_lock.destroy()
         self.peer_list.destroy()
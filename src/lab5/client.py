@@ -16,6 +16,7 @@ import argparse
 
 sys.path.append("../modules")
 from Common import orb
+from Common.nameServiceCache import NameServiceCache
 from Common.nameServiceLocation import name_service_address
 from Common.objectType import object_type
 
@@ -29,8 +30,21 @@ Client for a fortune database. It reads a random fortune from the database.\
 
 parser = argparse.ArgumentParser(description=description)
 parser.add_argument(
-    "-w", "--write", metavar="FORTUNE", dest="fortune",
-    help="Write a new fortune to the database."
+    "-w", "--write", metavar="FORTUNE", dest="fortunes", action="append",
+    help="Write a new fortune to the database. Repeat to write several "
+         "fortunes in a single call."
+)
+parser.add_argument(
+    "-n", "--count", metavar="N", dest="count", type=int, default=1,
+    help="Read N different fortunes in a single call."
+)
+parser.add_argument(
+    "-a", "--all", action="store_true", dest="all", default=False,
+    help="Print all the fortunes of the database."
+)
+parser.add_argument(
+    "-g", "--grep", metavar="PATTERN", dest="pattern",
+    help="Print all the fortunes containing PATTERN."
 )
 parser.add_argument(
     "-i", "--interactive", action="store_true", dest="interactive",
@@ -55,12 +69,12 @@ assert server_type != "object", "Change the object type to something unique!"
 # -----------------------------------------------------------------------------
 
 # Connect to the name service to obtain the address of the server.
-ns = orb.Stub(name_service_address)
+ns = NameServiceCache(orb.Stub(name_service_address))
 
 if server_id is None:
-    server_address = tuple(ns.require_any(server_type))
+    server_address = ns.require_any(server_type)
 else:
-    server_address = tuple(ns.require_object(server_type, server_id))
+    server_address = ns.require_object(server_type, server_id)
 
 print("Connecting to server: {}".format(server_address))
 
@@ -69,9 +83,22 @@ db = orb.Stub(server_address)
 
 if not opts.interactive:
     # Run in the normal mode.
-    if opts.fortune is not None:
-        print("Writing '{}' to the fortune database.".format(opts.fortune))
-        db.write(opts.fortune)
+    if opts.fortunes is not None:
+        for fortune in opts.fortunes:
+            print("Writing '{}' to the fortune database.".format(fortune))
+        if len(opts.fortunes) == 1:
+            db.write(opts.fortunes[0])
+        else:
+            db.write_many(opts.fortunes)
+    elif opts.all or opts.pattern is not None:
+        with db.fortunes(opts.pattern) as fortunes:
+            for fortune in fortunes:
+                print(fortune)
+                print("%")
+    elif opts.count > 1:
+        for fortune in db.read_many(opts.count):
+            print(fortune)
+            print("%")
     else:
         print(db.read())
 
@@ -81,6 +108,7 @@ else:
         print("""\
 Choose one of the following commands:
     r            ::  read a random fortune from the database,
+    a [PATTERN]  ::  list the fortunes (containing PATTERN),
     w <FORTUNE>  ::  write a new fortune into the database,
     h            ::  print this menu,
     q            ::  exit.\
@@ -93,6 +121,12 @@ Choose one of the following commands:
         command = input()
         if command == "r":
             print(db.read())
+        elif command == "a" or command[:2] in ["a ", "a\t"]:
+            pattern = command[2:].strip() or None
+            with db.fortunes(pattern) as fortunes:
+                for fortune in fortunes:
+                    print(fortune)
+                    print("%")
         elif (len(command) > 1 and command[0] == "w" and
                 command[1] in [" ", "\t"]):
             db.write(command[2:].strip())
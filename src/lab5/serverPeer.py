@@ -29,6 +29,7 @@ from Common.objectType import object_type
 
 from Server import database
 from Server.peerList import PeerList
+from Server.failureDetector import FailureDetector
 from Server.Lock.distributedLock import DistributedLock
 from Server.Lock.distributedReadWriteLock import DistributedReadWriteLock
 
@@ -46,6 +47,11 @@ parser.add_argument(
     help="Set the port to listen to. Values in [40001, 50000]. "
          "The default value is chosen at random."
 )
+parser.add_argument(
+    "-u", "--unix", metavar="PATH", dest="unix",
+    help="Listen to the Unix domain socket PATH instead of a TCP port, "
+         "when all the replicas and clients run on the same machine."
+)
 parser.add_argument(
     "-t", "--type", metavar="TYPE", dest="type", default=object_type,
     help="Set the type of the client."
@@ -54,10 +60,67 @@ parser.add_argument(
     "-f", "--file", metavar="FILE", dest="file", default="dbs/fortune.db",
     help="Set the database file. Default: dbs/fortune.db."
 )
+parser.add_argument(
+    "-w", "--workers", metavar="N", dest="workers", type=int, default=0,
+    help="Serve requests with a pool of N worker threads instead of one "
+         "thread per connection. Default: 0 (one thread per connection)."
+)
+parser.add_argument(
+    "-q", "--queue-size", metavar="N", dest="queue_size", type=int,
+    default=1024,
+    help="Maximum number of requests waiting for a worker. Default: 1024."
+)
+parser.add_argument(
+    "-s", "--stats", metavar="FILE", dest="stats_file",
+    help="Append call statistics to FILE as JSON lines every 10 seconds."
+)
+parser.add_argument(
+    "-P", "--processes", metavar="N", dest="processes", type=int, default=1,
+    help="Serve the reads from N processes, to use several cores. The "
+         "other calls are run by the main process. Default: 1."
+)
+parser.add_argument(
+    "-l", "--log", action="store_true", dest="log", default=False,
+    help="Keep the database file open as a log, and answer the writes once "
+         "they are on disk. Concurrent writes are saved together."
+)
+parser.add_argument(
+    "-d", "--commit-delay", metavar="SECONDS", dest="commit_delay",
+    type=float, default=0.0,
+    help="With --log, wait up to SECONDS for more writes to save together. "
+         "Default: 0."
+)
+parser.add_argument(
+    "-H", "--heartbeat", metavar="SECONDS", dest="heartbeat", type=float,
+    default=1.0,
+    help="Ping the other servers every SECONDS seconds to detect the ones "
+         "that have died. 0 turns the pings off. Default: 1."
+)
+parser.add_argument(
+    "-m", "--max-requests", metavar="N", dest="max_requests", type=int,
+    help="Reject the requests beyond N in progress at once with an "
+         "Overloaded error, which the callers retry later. Default: no "
+         "limit."
+)
+parser.add_argument(
+    "-M", "--max-per-client", metavar="N", dest="max_per_client", type=int,
+    help="Reject the requests of a client host beyond N in progress at "
+         "once. Default: no limit."
+)
 opts = parser.parse_args()
 
 local_port = opts.port
+local_unix = opts.unix
 db_file = opts.file
+workers = opts.workers
+queue_size = opts.queue_size
+stats_file = opts.stats_file
+processes = opts.processes
+log = opts.log
+commit_delay = opts.commit_delay
+heartbeat = opts.heartbeat
+max_requests = opts.max_requests
+max_per_client = opts.max_per_client
 server_type = opts.type
 assert server_type != "object", "Change the object type to something unique!"
 
@@ -71,32 +134,68 @@ class Server(orb.Peer):
 
     """Distributed mutual exclusion client class."""
 
-    def __init__(self, local_address, ns_address, server_type, db_file):
+    # Methods that the other processes of the skeleton may run on their
+    # copy of the server (see orb.Skeleton).
+    read_only_methods = ("read", "read_many")
+
+    # The calls of the other servers are the last to be rejected when
+    # the server is overloaded: turning them away would stall the
+    # cluster for every client. Streaming the whole database is the
+    # first to go. The token passing methods and check are control
+    # methods (see the dispatch table), which are always high priority.
+    method_priorities = {
+        "register_peer":      "high",
+        "unregister_peer":    "high",
+        "write_local":        "high",
+        "write_local_many":   "high",
+        "fortunes":           "low"
+    }
+
+    def __init__(self, local_address, ns_address, server_type, db_file,
+                 log=False, commit_delay=0.0, heartbeat=1.0,
+                 **skeleton_options):
         """Initialize the client."""
 
-        orb.Peer.__init__(self, local_address, ns_address, server_type)
+        orb.Peer.__init__(self, local_address, ns_address, server_type,
+                          **skeleton_options)
         self.peer_list = PeerList(self)
         self.distributed_lock = DistributedLock(self, self.peer_list)
         self.drwlock = DistributedReadWriteLock(self.distributed_lock)
-        self.db = database.Database(db_file)
+        # With several processes, the reading ones load the fortunes
+        # written by the main process from the file.
+        self.db = database.Database(
+            db_file, shared=skeleton_options.get("processes", 1) > 1,
+            log=log, commit_delay=commit_delay)
+        self.failure_detector = None
+        if heartbeat:
+            self.failure_detector = FailureDetector(self, self.peer_list,
+                                                    heartbeat)
         self.dispatched_calls = {
+            "check":              orb.control(self.check),
             "display_peers":      self.peer_list.display_peers,
             "acquire":            self.distributed_lock.acquire,
             "release":            self.distributed_lock.release,
-            "request_token":      self.distributed_lock.request_token,
-            "obtain_token":       self.distributed_lock.obtain_token,
+            "request_token":      orb.control(
+                self.distributed_lock.request_token),
+            "obtain_token":       orb.control(
+                self.distributed_lock.obtain_token),
             "display_status":     self.distributed_lock.display_status
         }
         orb.Peer.start(self)
         self.peer_list.initialize()
         self.distributed_lock.initialize()
+        if self.failure_detector is not None:
+            self.failure_detector.start()
 
     # Public methods
 
     def destroy(self):
+        if self.failure_detector is not None:
+            self.failure_detector.stop()
         orb.Peer.destroy(self)
         self.distributed_lock.destroy()
         self.peer_list.destroy()
+        self.db.close()
 
     def __getattr__(self, attr):
         """Forward calls are dispatched here."""
@@ -120,6 +219,25 @@ class Server(orb.Peer):
         self.drwlock.read_release()
         return readData
 
+    def read_many(self, n):
+        """Read n different fortunes from the database."""
+
+        self.drwlock.read_acquire()
+        try:
+            return self.db.read_many(n)
+        finally:
+            self.drwlock.read_release()
+
+    def fortunes(self, pattern=None):
+        """Stream all the fortunes, or those containing pattern.
+
+        The fortunes are sent to the caller as it asks for them, so the
+        database is never sent as a single message.
+
+        """
+
+        return self.db.fortunes(pattern)
+
     def write(self, fortune):
         """Write a fortune to the database.
 
@@ -136,15 +254,8 @@ class Server(orb.Peer):
         self.drwlock.write_acquire()
         try:
             self.write_local(fortune)
-            peers = self.peer_list.get_peers()
-            for peer in peers:
-                if peer == self.id:
-                    continue
-                tmp_peer = peers[peer]
-                try:
-                    tmp_peer.write_local(fortune)
-                except:
-                    continue
+            others = self.peer_list.get_others()
+            orb.fan_out(others, "write_local", (fortune,))
         finally:
             self.drwlock.write_release()
 
@@ -156,12 +267,52 @@ class Server(orb.Peer):
 
         """
 
+        if self.db.log is not None:
+            # The log orders the writes itself, and reads do not need
+            # to wait for it.
+            self.db.write(fortune)
+            return
         self.drwlock.write_acquire_local()
         try:
             self.db.write(fortune)
         finally:
             self.drwlock.write_release_local()
 
+    def write_many(self, fortunes):
+        """Write a list of fortunes to the database.
+
+        The distributed lock is obtained once for all of them, and each
+        of the other servers is sent all of them in a single call to
+        'write_local_many'.
+
+        """
+
+        fortunes = list(fortunes)
+        self.drwlock.write_acquire()
+        try:
+            self.write_local_many(fortunes)
+            others = self.peer_list.get_others()
+            orb.fan_out(others, "write_local_many", (fortunes,))
+        finally:
+            self.drwlock.write_release()
+
+    def write_local_many(self, fortunes):
+        """Write a list of fortunes to the database.
+
+        This method is called only by other servers once they've
+        obtained the distributed lock.
+
+        """
+
+        if self.db.log is not None:
+            self.db.write_many(fortunes)
+            return
+        self.drwlock.write_acquire_local()
+        try:
+            self.db.write_many(fortunes)
+        finally:
+            self.drwlock.write_release_local()
+
     def register_peer(self, pid, paddr):
         """Register a server peer in this server's peer list."""
 
@@ -179,8 +330,15 @@ class Server(orb.Peer):
 # -----------------------------------------------------------------------------
 
 # Initialize the client object.
-local_address = (socket.gethostname(), local_port)
-p = Server(local_address, name_service_address, server_type, db_file)
+if local_unix is not None:
+    local_address = "unix:" + local_unix
+else:
+    local_address = (socket.gethostname(), local_port)
+p = Server(local_address, name_service_address, server_type, db_file,
+           log=log, commit_delay=commit_delay, heartbeat=heartbeat,
+           workers=workers, queue_size=queue_size,
+           stats_file=stats_file, processes=processes,
+           max_requests=max_requests, max_per_client=max_per_client)
 
 
 def menu():
@@ -0,0 +1,300 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Created: 18 October 2026
+#
+# Copyright 2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Benchmark scenarios of the ORB.
+
+All the objects of a benchmark (the name service and the peers) run in
+the process of the benchmark, and talk to each other over the chosen
+transport. Each scenario returns a dictionary of results that can be
+dumped as JSON:
+
+--  small_calls ::
+        One client calling a method with a tiny argument.
+--  large_payload ::
+        One client sending and receiving a large string.
+--  concurrent_clients ::
+        Several threads calling the same peer at once.
+--  fan_out ::
+        One client calling the same method on several peers at once.
+--  token_passing ::
+        Peers taking the distributed lock in turns, so that every
+        acquisition moves the token to another peer.
+
+"""
+
+import array
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from Common import orb
+from Common import stats
+from Server.nameService import NameService
+from Server.peerList import PeerList
+from Server.Lock.distributedLock import DistributedLock
+
+
+class EchoPeer(orb.Peer):
+
+    """Peer sending back its argument."""
+
+    def echo(self, data):
+        return data
+
+    def size(self, data):
+        return len(data)
+
+
+class LockPeer(orb.Peer):
+
+    """Peer sharing a distributed lock with the other peers of its type."""
+
+    def __init__(self, local_address, ns_address, peer_type,
+                 **skeleton_options):
+        orb.Peer.__init__(self, local_address, ns_address, peer_type,
+                          **skeleton_options)
+        self.peer_list = PeerList(self)
+        self.distributed_lock = DistributedLock(self, self.peer_list)
+        self.dispatched_calls = {
+            "release":            self.distributed_lock.release,
+            "request_token":      orb.control(
+                self.distributed_lock.request_token),
+            "obtain_token":       orb.control(
+                self.distributed_lock.obtain_token)
+        }
+        orb.Peer.start(self)
+        self.peer_list.initialize()
+        self.distributed_lock.initialize()
+
+    # Public methods
+
+    def __getattr__(self, attr):
+        """Forward calls are dispatched here."""
+
+        if attr in self.dispatched_calls:
+            return self.dispatched_calls[attr]
+        raise AttributeError(
+            "LockPeer instance has no attribute '{}'".format(attr))
+
+    def register_peer(self, pid, paddr):
+        self.peer_list.register_peer(pid, paddr)
+        self.distributed_lock.register_peer(pid)
+
+    def unregister_peer(self, pid):
+        self.peer_list.unregister_peer(pid)
+        self.distributed_lock.unregister_peer(pid)
+
+
+class Cluster(object):
+
+    """The name service and the peers of a benchmark.
+
+    transport is one of 'tcp', 'unix' and 'inproc'. The skeletons are
+    created with the given skeleton options (e.g. workers).
+
+    """
+
+    def __init__(self, transport="tcp", **skeleton_options):
+        self.transport = transport
+        self.skeleton_options = skeleton_options
+        self.directory = None
+        if transport == "unix":
+            self.directory = tempfile.mkdtemp(prefix="orb-benchmark-")
+        self.next_name = 0
+        self.echo_peers = []
+        self.lock_peers = []
+        self.name_service = NameService(self.address("name_service"),
+                                        check_interval=0, **skeleton_options)
+        self.name_service.start()
+        self.ns_address = self.name_service.skeleton.address
+
+    def address(self, name):
+        """Return a new address to listen to."""
+
+        self.next_name += 1
+        name = "{}-{}-{}".format(name, os.getpid(), self.next_name)
+        if self.transport == "tcp":
+            return ("127.0.0.1", 0)
+        elif self.transport == "unix":
+            return "unix:" + os.path.join(self.directory, name + ".sock")
+        elif self.transport == "inproc":
+            return "inproc:" + name
+        raise ValueError("Unknown transport: '{}'".format(self.transport))
+
+    def get_echo_peers(self, n):
+        """Return n peers answering to 'echo' and 'size'."""
+
+        while len(self.echo_peers) < n:
+            peer = EchoPeer(self.address("echo"), self.ns_address,
+                            "benchmark_echo", **self.skeleton_options)
+            peer.start()
+            self.echo_peers.append(peer)
+        return self.echo_peers[:n]
+
+    def get_lock_peers(self, n):
+        """Return n peers sharing a distributed lock.
+
+        The peers are created again when a different number is asked
+        for, since the lock is set up for a fixed list of peers.
+
+        """
+
+        if len(self.lock_peers) != n:
+            peer_type = "benchmark_lock_{}".format(self.next_name)
+            self.lock_peers = [LockPeer(self.address("lock"),
+                                        self.ns_address, peer_type,
+                                        **self.skeleton_options)
+                               for i in range(n)]
+        return self.lock_peers
+
+    def close(self):
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Hide what the peers print while a scenario runs."""
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def measure(call, count, threads=1, allocations=False):
+    """Run call() count times in each of a number of threads.
+
+    Return the throughput and the latency percentiles of the calls. With
+    allocations, the peak of the memory allocated while running is
+    reported as well (tracing slows the calls down).
+
+    """
+
+    # The latencies are stored in preallocated arrays, so that keeping
+    # them does not count as allocations of the calls.
+    latencies = [array.array("d", bytes(8 * count)) for i in range(threads)]
+    errors = [0] * threads
+
+    def run(i):
+        for j in range(count):
+            begin = time.perf_counter()
+            try:
+                call()
+            except Exception:
+                errors[i] += 1
+            latencies[i][j] = time.perf_counter() - begin
+
+    workers = [threading.Thread(target=run, args=(i,))
+               for i in range(threads)]
+    if allocations:
+        tracemalloc.start()
+    begin = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - begin
+    result = {}
+    if allocations:
+        result["allocated_peak"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    histogram = stats.Histogram()
+    for thread_latencies in latencies:
+        for seconds in thread_latencies:
+            histogram.add(seconds)
+    result.update({
+        "calls": histogram.total,
+        "errors": sum(errors),
+        "seconds": elapsed,
+        "calls_per_second": histogram.total / elapsed if elapsed else 0.0,
+        "latency": {
+            "mean": histogram.sum / histogram.total
+                    if histogram.total else 0.0,
+            "p50": histogram.percentile(50),
+            "p95": histogram.percentile(95),
+            "p99": histogram.percentile(99),
+            "max": histogram.max
+        }
+    })
+    return result
+
+
+def small_calls(cluster, count=10000, allocations=False, **options):
+    peer = cluster.get_echo_peers(1)[0]
+    stub = orb.Stub(peer.address)
+    stub.echo("x")
+    return measure(lambda: stub.echo("x"), count, 1, allocations)
+
+
+def large_payload(cluster, count=100, size=2 ** 20, allocations=False,
+                  **options):
+    peer = cluster.get_echo_peers(1)[0]
+    stub = orb.Stub(peer.address)
+    payload = "x" * size
+    stub.echo(payload)
+    result = measure(lambda: stub.echo(payload), count, 1, allocations)
+    result["size"] = size
+    result["bytes_per_second"] = 2 * size * result["calls_per_second"]
+    return result
+
+
+def concurrent_clients(cluster, count=2000, clients=8, allocations=False,
+                       **options):
+    peer = cluster.get_echo_peers(1)[0]
+    stub = orb.Stub(peer.address)
+    stub.echo("x")
+    result = measure(lambda: stub.echo("x"), count, clients, allocations)
+    result["clients"] = clients
+    return result
+
+
+def fan_out(cluster, count=1000, peers=4, allocations=False, **options):
+    stubs = [orb.Stub(peer.address)
+             for peer in cluster.get_echo_peers(peers)]
+
+    def call():
+        for result in orb.fan_out(stubs, "echo", ("x",)).values():
+            if isinstance(result, Exception):
+                raise result
+
+    call()
+    result = measure(call, count, 1, allocations)
+    result["peers"] = peers
+    return result
+
+
+def token_passing(cluster, count=1000, peers=4, allocations=False,
+                  **options):
+    with quiet():
+        lock_peers = cluster.get_lock_peers(peers)
+    turn = [0]
+
+    def call():
+        peer = lock_peers[turn[0] % len(lock_peers)]
+        turn[0] += 1
+        peer.distributed_lock.acquire()
+        peer.distributed_lock.release()
+
+    with quiet():
+        call()
+        result = measure(call, count, 1, allocations)
+    result["peers"] = peers
+    return result
+
+
+scenarios = {
+    "small_calls": small_calls,
+    "large_payload": large_payload,
+    "concurrent_clients": concurrent_clients,
+    "fan_out": fan_out,
+    "token_passing": token_passing
+}
@@ -0,0 +1,125 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Created: 18 October 2026
+#
+# Copyright 2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Admission control of the requests served by a skeleton.
+
+A skeleton runs at most max_requests requests at once, and at most
+max_per_client requests of the same client. Every method belongs to a
+priority class, and each class may only use a share of max_requests:
+when the skeleton gets busy, the requests of the low class are turned
+away first and those of the high class last. Requests that are not
+admitted are meant to be rejected right away, so that their callers can
+try again later instead of waiting behind a long queue.
+
+"""
+
+import threading
+
+# Share of max_requests that the requests of each priority class may
+# use, from the first class to be turned away to the last one.
+SHARES = {
+    "low": 0.5,
+    "normal": 0.8,
+    "high": 1.0
+}
+
+
+class AdmissionControl(object):
+
+    """Count the requests in progress and decide which ones may run.
+
+    priorities maps method names to priority classes (keys of shares);
+    the other methods are in the 'normal' class. A limit of None means
+    no limit.
+
+    """
+
+    def __init__(self, max_requests=None, max_per_client=None,
+                 priorities=None, shares=SHARES):
+        self.max_requests = max_requests
+        self.max_per_client = max_per_client
+        self.shares = dict(shares)
+        self.limits = {}
+        self.priorities = {}
+        self.set_priorities(priorities or {})
+        self.running = 0
+        self.clients = {}
+        self.rejected = {name: 0 for name in self.shares}
+        self.lock = threading.Lock()
+        for name, share in self.shares.items():
+            if max_requests is not None:
+                self.limits[name] = max(1, int(max_requests * share))
+
+    # Public methods
+
+    def set_priorities(self, priorities):
+        """Set the priority classes of the methods."""
+
+        for method, name in priorities.items():
+            if name not in self.shares:
+                raise ValueError("Unknown priority class '{}' of '{}'"
+                                 .format(name, method))
+        self.priorities = dict(priorities)
+
+    def priority(self, method):
+        return self.priorities.get(method, "normal")
+
+    def enter(self, client, method, force=False):
+        """Count a request in if it may run now.
+
+        Return None when the request is admitted, and the reason why it
+        is not otherwise. Admitted requests must be counted out with
+        leave. Requests of the client None are only subject to the
+        overall limits. With force, the request is counted in without
+        checking the limits, for requests that cannot be turned away.
+
+        """
+
+        priority = self.priority(method)
+        with self.lock:
+            limit = self.limits.get(priority)
+            running = self.clients.get(client, 0)
+            if not force:
+                if limit is not None and self.running >= limit:
+                    self.rejected[priority] += 1
+                    return "{} requests in progress, at most {} for {} " \
+                           "priority calls".format(self.running, limit,
+                                                   priority)
+                if client is not None and self.max_per_client is not None \
+                        and running >= self.max_per_client:
+                    self.rejected[priority] += 1
+                    return "{} requests of the caller in progress".format(
+                        running)
+            self.running += 1
+            if client is not None:
+                self.clients[client] = running + 1
+        return None
+
+    def leave(self, client):
+        """Count out a request admitted by enter."""
+
+        with self.lock:
+            self.running -= 1
+            if client is not None:
+                running = self.clients[client] - 1
+                if running:
+                    self.clients[client] = running
+                else:
+                    del self.clients[client]
+
+    def snapshot(self):
+        """Return the requests in progress and the rejected ones."""
+
+        with self.lock:
+            return {
+                "running": self.running,
+                "clients": len(self.clients),
+                "max_requests": self.max_requests,
+                "max_per_client": self.max_per_client,
+                "rejected": dict(self.rejected)
+            }
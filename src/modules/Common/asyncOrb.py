@@ -0,0 +1,541 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Created: 18 October 2026
+#
+# Copyright 2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Object Request Broker running on an asyncio event loop.
+
+This module mirrors the classes of the orb module, but all the network
+operations are coroutines running on a single event loop:
+
+--  AsyncStub ::
+        Image of a remote object, whose calls are awaitable.
+--  AsyncSkeleton ::
+        Listens to incoming connections with asyncio.start_server and
+        forwards the calls to the owner object.
+--  AsyncPeer ::
+        Base class for objects served by an AsyncSkeleton.
+
+The messages exchanged are the same as in the orb module, so that
+Peer and AsyncPeer objects can call each other. TCP and Unix domain
+socket addresses are supported; inproc addresses are not.
+
+"""
+
+import asyncio
+import collections
+import inspect
+import json
+import time
+from . import orb
+from . import codec
+from . import stats
+from . import transport
+
+# Longest message accepted on a connection.
+MESSAGE_LIMIT = codec.MAX_FRAME
+
+
+class AsyncConnection(object):
+
+    """A pair of asyncio streams carrying messages.
+
+    Like orb.Connection, it carries JSON lines until a codec has been
+    agreed upon and length-prefixed frames afterwards.
+
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.codec = None
+
+    async def send(self, data):
+        if self.codec is None:
+            payload = (json.dumps(data) + "\n").encode("utf-8")
+            buffers = [payload]
+        else:
+            payload = self.codec.encode(data)
+            buffers = [codec.HEADER.pack(len(payload)), payload]
+        if len(payload) > MESSAGE_LIMIT:
+            raise orb.CommunicationError(
+                "Message of {} bytes, longer than {}".format(
+                    len(payload), MESSAGE_LIMIT))
+        self.writer.writelines(buffers)
+        await self.writer.drain()
+
+    async def receive(self):
+        try:
+            if self.codec is None:
+                line = await self.reader.readline()
+                if not line:
+                    raise orb.ConnectionClosed(
+                        "Connection closed by the other end")
+                return json.loads(line.decode("utf-8"))
+            header = await self.reader.readexactly(codec.HEADER.size)
+            size = codec.HEADER.unpack(header)[0]
+            if size > MESSAGE_LIMIT:
+                raise orb.CommunicationError(
+                    "Frame of {} bytes, longer than {}".format(
+                        size, MESSAGE_LIMIT))
+            return self.codec.decode(await self.reader.readexactly(size))
+        except asyncio.IncompleteReadError:
+            raise orb.ConnectionClosed("Connection closed by the other end")
+
+    async def negotiate(self, offered):
+        """Ask the other end to switch to one of the offered codecs."""
+
+        await self.send({"method": "__codec__", "args": [offered]})
+        reply = await self.receive()
+        if "error" in reply:
+            if reply["error"].get("name") == "AttributeError":
+                return False
+            orb.check_if_error(reply)
+        name = reply.get("result")
+        if name not in codec.codecs:
+            return False
+        self.codec = codec.codecs[name]
+        return True
+
+    def is_alive(self):
+        return not self.reader.at_eof() and not self.writer.is_closing()
+
+    def close(self):
+        self.writer.close()
+
+
+async def fan_out(stubs, method, args=(), timeout=None):
+    """Call the same method on several stubs concurrently.
+
+    stubs is either a list of stubs or a dictionary of stubs. The
+    result has the same keys (or indexes) and holds for each stub either
+    the returned value or the exception raised by the call. Calls that
+    take longer than timeout seconds raise orb.DeadlineExceeded.
+
+    """
+
+    if isinstance(stubs, dict):
+        keys = list(stubs.keys())
+        targets = [stubs[k] for k in keys]
+    else:
+        keys = list(range(len(stubs)))
+        targets = list(stubs)
+    calls = [stub.call(method, *args, timeout=timeout) for stub in targets]
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    return dict(zip(keys, results))
+
+
+class AsyncStub(object):
+
+    """Stub whose remote calls are coroutines.
+
+    Idle connections are kept by the stub and reused by later calls.
+    New connections negotiate a codec the same way orb.Stub does. Calls
+    give up after timeout seconds (no limit when None) and raise
+    orb.DeadlineExceeded. Calls rejected with orb.Overloaded are tried
+    again like those of orb.Stub.
+
+    """
+
+    def __init__(self, address, max_idle=8, codecs=codec.preferred,
+                 timeout=None, retries=orb.RETRIES,
+                 backoff=orb.RETRY_BACKOFF):
+        self.address = transport.normalize(address)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_idle = max_idle
+        self.codecs = codecs
+        self.legacy = False
+        self.idle = []
+
+    # Private methods
+
+    async def _open(self):
+        scheme, target = transport.split(self.address)
+        if scheme == "tcp":
+            reader, writer = await asyncio.open_connection(
+                target[0], target[1], limit=MESSAGE_LIMIT)
+        elif scheme == "unix":
+            reader, writer = await asyncio.open_unix_connection(
+                target, limit=MESSAGE_LIMIT)
+        else:
+            raise ValueError("Unsupported address: '{}'".format(
+                self.address))
+        return AsyncConnection(reader, writer)
+
+    async def _acquire(self):
+        while self.idle:
+            conn = self.idle.pop()
+            if conn.is_alive():
+                return conn, True
+            conn.close()
+        conn = await self._open()
+        if self.legacy or not self.codecs:
+            return conn, False
+        try:
+            if await conn.negotiate(self.codecs):
+                return conn, False
+        except BaseException:
+            conn.close()
+            raise
+        self.legacy = True
+        conn.close()
+        return await self._open(), False
+
+    def _release(self, conn):
+        if not self.legacy and len(self.idle) < self.max_idle:
+            self.idle.append(conn)
+        else:
+            conn.close()
+
+    async def _call(self, request):
+        method = request["method"]
+        while True:
+            conn, reused = await self._acquire()
+            begin = time.perf_counter()
+            written = False
+            try:
+                await conn.send(request)
+                written = True
+                reply = await conn.receive()
+            except (OSError, orb.CommunicationError):
+                conn.close()
+                # Sent again only if the other end cannot have run it
+                # (see orb.Stub._exchange).
+                if reused and not written:
+                    continue
+                orb.client_stats.record(method, time.perf_counter() - begin,
+                                        True)
+                raise
+            except BaseException:
+                # A cancelled call leaves a reply pending on the socket.
+                conn.close()
+                raise
+            self._release(conn)
+            orb.client_stats.record(method, time.perf_counter() - begin,
+                                    "error" in reply)
+            if "stream" in reply:
+                return AsyncRemoteIterator(self, reply["stream"])
+            return orb.check_if_error(reply)
+
+    async def _call_retrying(self, request):
+        attempt = 0
+        while True:
+            try:
+                return await self._call(request)
+            except orb.Overloaded:
+                if attempt >= self.retries:
+                    raise
+            await asyncio.sleep(orb.retry_delay(self.backoff, attempt))
+            attempt += 1
+
+    # Public methods
+
+    async def call(self, method, *args, timeout=None):
+        """Call a method of the remote object.
+
+        timeout overrides the timeout of the stub for this call.
+
+        """
+
+        if timeout is None:
+            timeout = self.timeout
+        request = {"method": method, "args": args}
+        if timeout is None:
+            return await self._call_retrying(request)
+        request["timeout"] = timeout
+        begin = time.perf_counter()
+        try:
+            return await asyncio.wait_for(self._call_retrying(request),
+                                          timeout)
+        except asyncio.TimeoutError:
+            orb.client_stats.record(method, time.perf_counter() - begin,
+                                    True)
+            raise orb.DeadlineExceeded(
+                "No reply to '{}' within {} seconds".format(method, timeout))
+
+    async def notify(self, method, *args):
+        """Call a method of the remote object without waiting for it."""
+
+        request = {"method": method, "args": args, "oneway": True}
+        while True:
+            conn, reused = await self._acquire()
+            written = False
+            try:
+                await conn.send(request)
+                written = True
+                if conn.codec is None:
+                    # Peers speaking JSON lines reply to every call.
+                    orb.check_if_error(await conn.receive())
+            except (OSError, orb.CommunicationError):
+                conn.close()
+                if reused and not written:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            self._release(conn)
+            return
+
+    def close(self):
+        """Close the idle connections."""
+
+        while self.idle:
+            self.idle.pop().close()
+
+    def __getattr__(self, attr):
+        """Forward call to name over the network at the given address."""
+        async def rmi_call(*args):
+            return await self.call(attr, *args)
+        return rmi_call
+
+
+class AsyncRemoteIterator(object):
+
+    """Asynchronous iterator over a result streamed by a remote object.
+
+    Works as orb.RemoteIterator, with async for and async with.
+
+    """
+
+    def __init__(self, stub, sid, chunk_size=orb.STREAM_CHUNK):
+        self.stub = stub
+        self.sid = sid
+        self.chunk_size = chunk_size
+        self.items = collections.deque()
+        self.done = False
+        self.pending = None
+        self._pull()
+
+    # Private methods
+
+    def _pull(self):
+        self.pending = asyncio.ensure_future(
+            self.stub.call("__stream_next__", self.sid, self.chunk_size))
+
+    # Public methods
+
+    async def close(self):
+        """Drop the stream at the other end."""
+
+        if self.done:
+            return
+        self.done = True
+        self.items.clear()
+        try:
+            if self.pending is not None:
+                await self.pending
+        except Exception:
+            pass
+        try:
+            await self.stub.call("__stream_close__", self.sid)
+        except (OSError, orb.CommunicationError):
+            pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self.items:
+            if self.done or self.pending is None:
+                raise StopAsyncIteration
+            pending = self.pending
+            self.pending = None
+            try:
+                items, done = await pending
+            except Exception:
+                self.done = True
+                raise
+            self.items.extend(items)
+            if done:
+                self.done = True
+            else:
+                self._pull()
+        return self.items.popleft()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+class AsyncSkeleton(object):
+
+    """Serve the calls to an owner object on the event loop.
+
+    Methods of the owner may be coroutine functions, in which case they
+    are awaited before the reply is sent. As for orb.Skeleton, only the
+    methods exported by the owner can be called, and methods returning a
+    generator have their results streamed.
+
+    """
+
+    def __init__(self, owner, address):
+        self.address = transport.normalize(address)
+        self.owner = owner
+        self.server = None
+        self.methods = {}
+        self.streams = orb.StreamTable()
+        self.stats = stats.Statistics()
+
+    # Private methods
+
+    async def _serve(self, reader, writer):
+        conn = AsyncConnection(reader, writer)
+        try:
+            while True:
+                try:
+                    request = await conn.receive()
+                except orb.ConnectionClosed:
+                    break
+                await self.serve(conn, request)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print("The connection to the caller has died:")
+            print("\t{}: {}".format(type(e), e))
+        finally:
+            conn.close()
+
+    # Public methods
+
+    async def serve(self, conn, request):
+        """Run a request that came on a connection and send the reply."""
+
+        if request.get("method") == "__codec__":
+            name = codec.choose(request.get("args")[0])
+            await conn.send({"result": name})
+            if name is not None:
+                conn.codec = codec.codecs[name]
+        elif request.get("oneway") and conn.codec is not None:
+            result = await self.process_request(request)
+            if "error" in result:
+                print("One-way call to '{}' failed: {}".format(
+                    request.get("method"), result["error"]))
+        else:
+            reply = await self.process_request(request)
+            try:
+                await conn.send(reply)
+            except OSError:
+                raise
+            except Exception as e:
+                # Nothing has been sent: see orb.Skeleton.send_reply.
+                await conn.send(orb.error_reply(e))
+
+    async def process_request(self, request):
+        """Run a request on the owner and build the reply message."""
+
+        begin = time.perf_counter()
+        method = request.get("method")
+        try:
+            args = tuple(request.get("args"))
+            if method == "__batch__":
+                method_result = await self.process_batch(*args)
+            elif method == "__stats__":
+                method_result = self.get_stats()
+            elif method == "__stream_next__":
+                method_result = self.streams.next(*args)
+            elif method == "__stream_close__":
+                method_result = self.streams.close(*args)
+            else:
+                function = self.methods.get(method)
+                if function is None:
+                    raise AttributeError(
+                        "'{}' object has no exported method '{}'".format(
+                            type(self.owner).__name__, method))
+                method_result = function(*args)
+                if inspect.isawaitable(method_result):
+                    method_result = await method_result
+            if inspect.isgenerator(method_result):
+                result = orb.stream_reply(self.streams, method_result,
+                                          request)
+            else:
+                result = {
+                    "result": method_result
+                }
+        except Exception as e:
+            result = orb.error_reply(e)
+        self.stats.record(orb.stats_key(self.methods, method),
+                          time.perf_counter() - begin, "error" in result)
+        return result
+
+    def get_stats(self):
+        """Return the statistics of the calls served and made here."""
+
+        return {
+            "address": self.address,
+            "queue_depth": 0,
+            "streams": len(self.streams),
+            "server": self.stats.snapshot(),
+            "client": orb.client_stats.snapshot()
+        }
+
+    async def process_batch(self, calls):
+        """Run the calls of a batch and return all their replies."""
+
+        return [await self.process_request({"method": method, "args": args})
+                for method, args in calls]
+
+    async def start(self):
+        self.methods = orb.export_methods(self.owner)
+        if transport.is_local(self.address):
+            raise ValueError("Unsupported address: '{}'".format(
+                self.address))
+        self.server = await asyncio.start_server(
+            self._serve, sock=transport.listen(self.address),
+            limit=MESSAGE_LIMIT)
+        if not isinstance(self.address, str) and self.address[1] == 0:
+            # Listening to port 0 picks a free port.
+            port = self.server.sockets[0].getsockname()[1]
+            self.address = (self.address[0], port)
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+
+
+class AsyncPeer(object):
+
+    """Class, extended by objects that communicate over the network from
+    an event loop.
+
+    """
+
+    # Public methods that remote objects are not allowed to call.
+    local_methods = ("start", "destroy")
+
+    def __init__(self, l_address, ns_address, ptype):
+        self.type = ptype
+        self.hash = ""
+        self.id = -1
+        self.address = orb.get_external_interface(l_address)
+        self.skeleton = AsyncSkeleton(self, self.address)
+        self.name_service_address = orb.get_external_interface(ns_address)
+        self.name_service = AsyncStub(self.name_service_address)
+
+    # Public methods
+
+    async def start(self):
+        """Start the communication interface."""
+
+        await self.skeleton.start()
+        self.address = self.skeleton.address
+        self.id, self.hash = await self.name_service.register(self.type,
+                                                              self.address)
+
+    async def destroy(self):
+        """Unregister the object before removal."""
+
+        await self.name_service.unregister(self.id, self.type, self.hash)
+        self.skeleton.close()
+
+    def check(self):
+        """Checking to see if the object is still alive."""
+
+        return (self.id, self.type)
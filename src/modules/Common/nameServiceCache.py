@@ -0,0 +1,145 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Created: 18 October 2026
+#
+# Copyright 2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Client side cache of the name service lookups.
+
+The lookups (require_all, require_any and require_object) are kept for
+a number of seconds, so that a process looking up the same type again
+does not have to ask the name service each time. Failed lookups are
+also kept, for a shorter time. Entries holding an address are dropped
+as soon as a connection to that address fails.
+
+"""
+
+import random
+import threading
+import time
+from . import orb
+from . import transport
+
+
+class NameServiceCache(object):
+
+    """Cache in front of a stub of the name service.
+
+    Calls other than the lookups are forwarded to the name service.
+    register and unregister also drop the cached lookups of the type
+    they change.
+
+    """
+
+    def __init__(self, name_service, ttl=5.0, negative_ttl=1.0):
+        self.name_service = name_service
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+        orb.add_failure_listener(self.invalidate_address)
+
+    # Private methods
+
+    def _lookup(self, key, fetch):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and entry[0] > now:
+            if isinstance(entry[1], Exception):
+                raise entry[1]
+            return entry[1]
+        try:
+            value = fetch()
+        except (OSError, orb.CommunicationError):
+            # The name service itself cannot be reached: nothing to keep.
+            raise
+        except Exception as e:
+            with self.lock:
+                self.entries[key] = (now + self.negative_ttl, e)
+            raise
+        ttl = self.ttl if value else self.negative_ttl
+        with self.lock:
+            self.entries[key] = (now + ttl, value)
+        return value
+
+    # Public methods
+
+    def require_all(self, ptype):
+        return self._lookup(("all", ptype),
+                            lambda: self.name_service.require_all(ptype))
+
+    def require_any(self, ptype):
+        """Pick one of the cached objects of the type, if there are any."""
+
+        peers = self.require_all(ptype)
+        if peers:
+            return random.choice(peers)[1]
+        return self._lookup(("any", ptype),
+                            lambda: self.name_service.require_any(ptype))
+
+    def require_object(self, ptype, pid):
+        return self._lookup(
+            ("object", ptype, pid),
+            lambda: self.name_service.require_object(ptype, pid))
+
+    def register(self, ptype, address):
+        self.invalidate(ptype)
+        return self.name_service.register(ptype, address)
+
+    def unregister(self, pid, ptype, phash):
+        self.invalidate(ptype)
+        return self.name_service.unregister(pid, ptype, phash)
+
+    def update(self, ptype, peers):
+        """Replace the cached list of objects of a type.
+
+        Used by name services that push changes to their clients.
+
+        """
+
+        with self.lock:
+            for key in list(self.entries.keys()):
+                if key[1] == ptype:
+                    del self.entries[key]
+            self.entries[("all", ptype)] = (time.monotonic() + self.ttl,
+                                            peers)
+
+    def invalidate(self, ptype=None):
+        """Drop the cached lookups of a type, or all of them."""
+
+        with self.lock:
+            if ptype is None:
+                self.entries.clear()
+                return
+            for key in list(self.entries.keys()):
+                if key[1] == ptype:
+                    del self.entries[key]
+
+    def invalidate_address(self, address):
+        """Drop the cached lookups whose answer contains an address."""
+
+        address = transport.normalize(address)
+        with self.lock:
+            for key, (expiry, value) in list(self.entries.items()):
+                # Failed and empty lookups hold no address.
+                if isinstance(value, Exception) or not value:
+                    continue
+                if key[0] == "all":
+                    found = any(transport.normalize(v[1]) == address
+                                for v in value)
+                else:
+                    found = transport.normalize(value) == address
+                if found:
+                    del self.entries[key]
+
+    def close(self):
+        """Stop following the connection failures."""
+
+        orb.remove_failure_listener(self.invalidate_address)
+
+    def __getattr__(self, attr):
+        """Forward the other calls to the name service."""
+        return getattr(self.name_service, attr)
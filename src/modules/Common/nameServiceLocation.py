@@ -12,7 +12,21 @@
 This module's role is simply to allow easy maintenance of the lab
 structure if the name service changes address.
 
+The address can be overridden with the TDDD25_NAME_SERVICE environment
+variable, given as host:port (e.g. localhost:42424 to use a name service
+started with nameService/nameServer.py) or as unix:/path/to/socket.
+
 """
 
+import os
+
 name_service_address = ("chipolata2.ida.liu.se", 42424)
 #name_service_address = ("localhost", 10.253.240.131)
+
+if "TDDD25_NAME_SERVICE" in os.environ:
+    _address = os.environ["TDDD25_NAME_SERVICE"]
+    if _address.startswith("unix:"):
+        name_service_address = _address
+    else:
+        _host, _port = _address.rsplit(":", 1)
+        name_service_address = (_host, int(_port))
@@ -7,10 +7,27 @@
 # Copyright 2012-2017 Linkoping University
 # -----------------------------------------------------------------------------
 
+import os
+import atexit
+import shutil
+import tempfile
 import threading
+import inspect
+import itertools
+import concurrent.futures
+import collections
+import selectors
+import select
+import queue
 import socket
 import json
+import random
 import time
+from . import admission
+from . import codec
+from . import stats
+from . import transport
+from . import nameServiceCache
 """Object Request Broker
 
 This module implements the infrastructure needed to transparently create
@@ -27,6 +44,10 @@ objects that communicate via networks. This infrastructure consists of:
         communication. Any object wishing to transparently interact with
         remote objects should extend this class.
 
+Objects are reached over TCP, Unix domain sockets or, within the same
+process, directly, depending on the form of their address (see the
+transport module).
+
 """
 
 
@@ -34,43 +55,918 @@ class CommunicationError(Exception):
     pass
 
 
+class ConnectionClosed(CommunicationError):
+    pass
+
+
+class Overloaded(CommunicationError):
+    pass
+
+
+class DeadlineExceeded(CommunicationError):
+    pass
+
+
+class StreamClosed(CommunicationError):
+    pass
+
+
+# Errors that are raised with their own class when they come back from
+# the other end of a connection.
+known_errors = {
+    "CommunicationError": CommunicationError,
+    "ConnectionClosed": ConnectionClosed,
+    "Overloaded": Overloaded,
+    "DeadlineExceeded": DeadlineExceeded,
+    "StreamClosed": StreamClosed
+}
+
+# Number of items of a streamed result asked for at a time.
+STREAM_CHUNK = 64
+
+# Seconds after which a streamed result nobody pulls from is dropped.
+STREAM_TIMEOUT = 60.0
+
+# Number of times a call rejected with Overloaded is tried again, and
+# the longest delay (in seconds) before the first retry. The delay is
+# doubled at every retry.
+RETRIES = 3
+RETRY_BACKOFF = 0.05
+
+# Number of threads serving the control methods (see control), apart
+# from the workers serving the other requests.
+CONTROL_WORKERS = 16
+
+# Methods served by every skeleton, apart from those of its owner.
+BUILTIN_METHODS = frozenset(("__codec__", "__batch__", "__stats__",
+                             "__stream_next__", "__stream_close__"))
+
+# Name under which the statistics count the calls to methods that are
+# not exported, so that callers cannot add names to them at will.
+UNKNOWN_METHOD = "<unknown>"
+
+
+# Initial size of the receive buffer of a connection.
+BUFFER_SIZE = 2 ** 16
+
+# Receive buffers grown beyond this size for large messages are given
+# back once they are empty.
+MAX_IDLE_BUFFER = 2 ** 20
+
+
+class Connection(object):
+
+    """A socket carrying messages to and from the other end.
+
+    A new connection carries newline-delimited JSON messages. Once a
+    codec has been agreed upon (see negotiate), messages are sent as
+    length-prefixed frames encoded with that codec.
+
+    Incoming bytes are read with recv_into into a buffer that is reused
+    for the whole life of the connection, and the messages are decoded
+    from a memoryview of it without copying them out first. The buffer
+    grows to the size of the largest frame being received, so that it
+    is read in place, up to codec.MAX_FRAME bytes: a longer message is
+    refused with CommunicationError. Outgoing frames are sent with
+    sendmsg, without joining the header and the payload.
+
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.codec = None
+        self._allocate(BUFFER_SIZE)
+        self.start = 0
+        self.end = 0
+        self.wanted = 0
+        self.received = 0
+        self.reused = False
+        self.last_used = time.time()
+        # Who is calling on the connection, for admission control.
+        self.client = None
+
+    # Private methods
+
+    def _allocate(self, size):
+        """Replace the buffer, keeping the bytes not read yet."""
+
+        buffer = bytearray(size)
+        if getattr(self, "buffer", None) is not None:
+            pending = self.end - self.start
+            buffer[:pending] = self.view[self.start:self.end]
+            self.view.release()
+            self.start = 0
+            self.end = pending
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+
+    def _next_line(self):
+        pos = self.buffer.find(b"\n", self.start, self.end)
+        if pos < 0:
+            if self.end - self.start > codec.MAX_FRAME:
+                raise CommunicationError(
+                    "Message longer than {} bytes".format(codec.MAX_FRAME))
+            return None
+        line = str(self.view[self.start:pos], "utf-8")
+        self.received = pos + 1 - self.start
+        self.start = pos + 1
+        return json.loads(line)
+
+    def _next_frame(self):
+        available = self.end - self.start
+        if available < codec.HEADER.size:
+            return None
+        size = codec.HEADER.unpack_from(self.buffer, self.start)[0]
+        if size > codec.MAX_FRAME:
+            raise CommunicationError(
+                "Frame of {} bytes, longer than {}".format(size,
+                                                           codec.MAX_FRAME))
+        if available < codec.HEADER.size + size:
+            self.wanted = codec.HEADER.size + size
+            return None
+        begin = self.start + codec.HEADER.size
+        with self.view[begin:begin + size] as frame:
+            message = self.codec.decode(frame)
+        self.received = codec.HEADER.size + size
+        self.start = begin + size
+        self.wanted = 0
+        return message
+
+    def _send_buffers(self, buffers):
+        size = sum(len(b) for b in buffers)
+        if not hasattr(self.sock, "sendmsg"):
+            self.sock.sendall(b"".join(buffers))
+            return size
+        while buffers:
+            sent = self.sock.sendmsg(buffers)
+            # Drop what has been sent; sendmsg may stop in the middle of
+            # a buffer.
+            while buffers and sent >= len(buffers[0]):
+                sent -= len(buffers.pop(0))
+            if sent:
+                buffers[0] = memoryview(buffers[0])[sent:]
+        return size
+
+    # Public methods
+
+    def send(self, data):
+        """Send a message and return its size in bytes.
+
+        The message is encoded before anything is sent: when it cannot
+        be encoded, or is longer than codec.MAX_FRAME, the error is
+        raised and the connection is left as it was.
+
+        """
+
+        if self.codec is None:
+            payload = json.dumps(data).encode("utf-8")
+            buffers = [payload, b"\n"]
+        else:
+            payload = self.codec.encode(data)
+            buffers = [codec.HEADER.pack(len(payload)), payload]
+        if len(payload) > codec.MAX_FRAME:
+            raise CommunicationError(
+                "Message of {} bytes, longer than {}".format(
+                    len(payload), codec.MAX_FRAME))
+        return self._send_buffers(buffers)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def fill(self):
+        """Read the bytes available on the socket into the buffer."""
+
+        pending = self.end - self.start
+        if pending == 0:
+            # Everything has been consumed, start from the beginning.
+            self.start = self.end = 0
+            if len(self.buffer) > MAX_IDLE_BUFFER and not self.wanted:
+                self._allocate(BUFFER_SIZE)
+        needed = max(self.wanted, pending + 1)
+        if needed > len(self.buffer):
+            self._allocate(max(needed, 2 * len(self.buffer)))
+        elif self.start + needed > len(self.buffer):
+            # Move the start of the message to the front of the buffer.
+            self.view[:pending] = self.view[self.start:self.end]
+            self.start = 0
+            self.end = pending
+        n = self.sock.recv_into(self.view[self.end:])
+        if n == 0:
+            raise ConnectionClosed("Connection closed by the other end")
+        self.end += n
+
+    def next_message(self):
+        """Return the next complete message in the buffer, if any.
+
+        ValueError is raised for a message that is not a JSON object.
+
+        """
+
+        if self.codec is None:
+            message = self._next_line()
+        else:
+            message = self._next_frame()
+        if message is not None and not isinstance(message, dict):
+            raise ValueError("Malformed message: {} instead of an object"
+                             .format(type(message).__name__))
+        return message
+
+    def receive(self):
+        while True:
+            message = self.next_message()
+            if message is not None:
+                return message
+            self.fill()
+
+    def has_pending(self):
+        return self.start < self.end
+
+    def negotiate(self, offered):
+        """Ask the other end to switch to one of the offered codecs.
+
+        Return True if a codec has been agreed upon, and False if the
+        other end does not know about codecs (it answers that it has no
+        such method) or shares none of them: the connection then keeps
+        using JSON lines. Any other error is raised.
+
+        """
+
+        self.send({"method": "__codec__", "args": [offered]})
+        reply = self.receive()
+        if "error" in reply:
+            if reply["error"].get("name") == "AttributeError":
+                return False
+            check_if_error(reply)
+        name = reply.get("result")
+        if name not in codec.codecs:
+            return False
+        self.codec = codec.codecs[name]
+        return True
+
+    def is_alive(self):
+        """Check that an idle connection is still usable.
+
+        Nothing should be readable on an idle connection: a readable
+        socket means that the other end has closed it or sent data we
+        did not ask for.
+
+        """
+
+        if self.has_pending():
+            return False
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class ConnectionPool(object):
+
+    """Pool of open connections to one remote address.
+
+    Connections are handed to one caller at a time and given back to
+    the pool after the call so that other calls, possibly from other
+    threads, can reuse them.
+
+    New connections offer the codecs given in the constructor to the
+    other end. If the other end answers that it does not know about
+    codecs, the pool remembers it and sticks to JSON lines.
+
+    """
+
+    def __init__(self, address, max_idle=8, max_idle_time=60.0,
+                 codecs=codec.preferred):
+        self.address = address
+        self.max_idle = max_idle
+        self.max_idle_time = max_idle_time
+        self.codecs = codecs
+        self.legacy = False
+        self.idle = collections.deque()
+        self.lock = threading.Lock()
+
+    # Private methods
+
+    def _open(self, timeout):
+        return Connection(transport.connect(self.address, timeout))
+
+    def _connect(self, timeout):
+        conn = self._open(timeout)
+        if self.legacy or not self.codecs:
+            return conn
+        try:
+            if conn.negotiate(self.codecs):
+                return conn
+        except Exception:
+            # Only an answer from the other end tells that it does not
+            # know about codecs: a failed handshake says nothing.
+            conn.close()
+            raise
+        self.legacy = True
+        conn.close()
+        return self._open(timeout)
+
+    # Public methods
+
+    def acquire(self, timeout=None):
+        """Return an idle connection or open a new one.
+
+        timeout bounds the time spent opening a new connection.
+
+        """
+
+        now = time.time()
+        while True:
+            with self.lock:
+                if not self.idle:
+                    break
+                conn = self.idle.pop()
+            if (now - conn.last_used < self.max_idle_time and
+                    conn.is_alive()):
+                conn.reused = True
+                return conn
+            conn.close()
+        return self._connect(timeout)
+
+    def release(self, conn):
+        """Give a healthy connection back to the pool."""
+
+        conn.last_used = time.time()
+        if self.legacy:
+            # Peers without codecs serve a single request per connection.
+            conn.close()
+            return
+        with self.lock:
+            if len(self.idle) < self.max_idle:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+    def discard(self, conn):
+        """Drop a connection that has failed."""
+
+        conn.close()
+
+    def clear(self):
+        """Close all the idle connections."""
+
+        with self.lock:
+            idle = list(self.idle)
+            self.idle.clear()
+        for conn in idle:
+            conn.close()
+
+
+def error_reply(e):
+    """Build the reply message reporting an exception."""
+
+    return {
+        "error": {
+            "name": type(e).__name__,
+            "args": e.args
+        }
+    }
+
+
+def stream_reply(streams, iterator, request):
+    """Build the reply to a request whose result is a generator."""
+
+    if request.get("oneway"):
+        # Nobody is going to pull the items.
+        iterator.close()
+        return {"result": None}
+    return {"stream": streams.open(iterator)}
+
+
+def stats_key(methods, method):
+    """Return the name under which the calls to method are counted.
+
+    methods are the methods exported by the skeleton.
+
+    """
+
+    if isinstance(method, str) and (method in methods or
+                                    method in BUILTIN_METHODS):
+        return method
+    return UNKNOWN_METHOD
+
+
+def is_overloaded(data):
+    """Tell whether a reply message reports an Overloaded error."""
+
+    return data is not None and "error" in data and \
+        data["error"].get("name") == "Overloaded"
+
+
+def retry_delay(backoff, attempt):
+    """Return the delay before retrying a call rejected attempt times.
+
+    The delay is drawn at random up to backoff * 2 ** attempt, so that
+    callers rejected at the same time do not all come back together.
+
+    """
+
+    return random.uniform(0, backoff * 2 ** attempt)
+
+
+def client_key(addr):
+    """Return the key telling callers apart for admission control.
+
+    TCP callers are told apart by their host. The other callers are all
+    one client per connection.
+
+    """
+
+    if isinstance(addr, tuple) and addr:
+        return addr[0]
+    return None
+
+
+def check_if_error(data):
+    """Return the result of a reply message or raise the error in it."""
+
+    if "error" in data:
+        errorInfo = data["error"]
+        errorName = known_errors.get(errorInfo["name"])
+        if errorName is None:
+            errorName = type(errorInfo["name"], (Exception,), {})
+        errorArgs = tuple(errorInfo["args"])
+        raise errorName(*errorArgs)
+    else:
+        return data["result"]
+
+
+_interfaces = {}
+
+
+def get_external_interface(address):
+    """ Determine the external interface associated with a host name.
+
+    This function translates the machine's host name into its the
+    machine's external address, not into '127.0.0.1'.
+
+    Only TCP addresses are translated, and the lookup of each host name
+    is done once per process.
+
+    """
+
+    if isinstance(address, str):
+        return address
+    addr_name = address[0]
+    if addr_name != "":
+        if addr_name not in _interfaces:
+            addrs = socket.gethostbyname_ex(addr_name)[2]
+            if len(addrs) == 0:
+                raise CommunicationError("Invalid address to listen to")
+            elif len(addrs) == 1:
+                _interfaces[addr_name] = addrs[0]
+            else:
+                al = [a for a in addrs if a != "127.0.0.1"]
+                _interfaces[addr_name] = al[0]
+        addr_name = _interfaces[addr_name]
+    addr = list(address)
+    addr[0] = addr_name
+    return tuple(addr)
+
+
+class ControlMethod(object):
+
+    """A function marked as a control method (see control)."""
+
+    def __init__(self, function):
+        self.function = function
+
+    def __call__(self, *args):
+        return self.function(*args)
+
+
+def control(function):
+    """Mark an entry of a dispatch table as a control method.
+
+    Control methods keep the peers working together, like the token
+    passing of the distributed lock:
+
+        lock = self.distributed_lock
+        self.dispatched_calls = {
+            "request_token":      orb.control(lock.request_token),
+            ...
+        }
+
+    The skeleton serves them apart from the other calls (see Skeleton),
+    so that a flood of client calls does not hold them up. The marked
+    function is called as usual.
+
+    """
+
+    return ControlMethod(function)
+
+
+class ExportedMethod(object):
+
+    """A method of an owner object that remote callers may call.
+
+    The number of arguments the method accepts is computed once, so
+    that calls with a wrong number of arguments are rejected before
+    reaching the method.
+
+    """
+
+    def __init__(self, name, function):
+        self.name = name
+        self.control = isinstance(function, ControlMethod)
+        if self.control:
+            function = function.function
+        self.function = function
+        self.min_args = 0
+        self.max_args = 0
+        try:
+            parameters = inspect.signature(function).parameters.values()
+        except (TypeError, ValueError):
+            self.max_args = None
+            return
+        for p in parameters:
+            if p.kind == p.VAR_POSITIONAL:
+                self.max_args = None
+            elif p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD):
+                if self.max_args is not None:
+                    self.max_args += 1
+                if p.default is p.empty:
+                    self.min_args += 1
+
+    def __call__(self, *args):
+        if (len(args) < self.min_args or
+                (self.max_args is not None and len(args) > self.max_args)):
+            raise TypeError("{}() takes {} arguments ({} given)".format(
+                self.name,
+                self.min_args if self.min_args == self.max_args
+                else "{} to {}".format(self.min_args, self.max_args),
+                len(args)))
+        return self.function(*args)
+
+
+def export_methods(owner):
+    """Build the table of the methods of owner that can be called remotely.
+
+    These are the public methods of the class of owner, except the ones
+    listed in its local_methods attribute, and the entries of its
+    dispatched_calls dictionary, if it has one.
+
+    """
+
+    local = getattr(owner, "local_methods", ())
+    table = {}
+    for name in dir(type(owner)):
+        if name.startswith("_") or name in local:
+            continue
+        if inspect.isfunction(getattr(type(owner), name, None)):
+            table[name] = ExportedMethod(name, getattr(owner, name))
+    dispatched_calls = getattr(owner, "dispatched_calls", {})
+    for name, function in dispatched_calls.items():
+        table[name] = ExportedMethod(name, function)
+    return table
+
+
+_failure_listeners = []
+
+
+def add_failure_listener(listener):
+    """Call listener(address) whenever a connection to address fails."""
+
+    _failure_listeners.append(listener)
+
+
+def remove_failure_listener(listener):
+    if listener in _failure_listeners:
+        _failure_listeners.remove(listener)
+
+
+def notify_failure(address):
+    for listener in list(_failure_listeners):
+        try:
+            listener(address)
+        except Exception as e:
+            print("Failure listener error: {}: {}".format(type(e), e))
+
+
+# Statistics of the calls made by the stubs of this process.
+client_stats = stats.Statistics()
+
+_executor = None
+_control_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(control=False):
+    """Return the thread pool running the asynchronous calls.
+
+    Calls to control methods have a pool of their own, so that they do
+    not wait behind the other calls.
+
+    """
+
+    global _executor, _control_executor
+    with _executor_lock:
+        if control:
+            if _control_executor is None:
+                _control_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=CONTROL_WORKERS,
+                    thread_name_prefix="orb-control")
+            return _control_executor
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=32, thread_name_prefix="orb-call")
+        return _executor
+
+
+def fan_out(stubs, method, args=(), timeout=None, control=False):
+    """Call the same method on several stubs concurrently.
+
+    stubs is either a list of stubs or a dictionary of stubs. The
+    result has the same keys (or indexes) and holds for each stub either
+    the returned value or the exception raised by the call. Calls that
+    have not finished within timeout seconds are reported with a
+    DeadlineExceeded error. control tells that method is a control
+    method (see get_executor).
+
+    """
+
+    if isinstance(stubs, dict):
+        items = list(stubs.items())
+    else:
+        items = list(enumerate(stubs))
+    futures = [(key, stub.call_async(method, *args, timeout=timeout,
+                                     control=control))
+               for key, stub in items]
+    concurrent.futures.wait([f for _, f in futures], timeout)
+    results = {}
+    for key, future in futures:
+        if not future.done():
+            results[key] = DeadlineExceeded(
+                "No reply to '{}' within {} seconds".format(method, timeout))
+        elif future.exception() is not None:
+            results[key] = future.exception()
+        else:
+            results[key] = future.result()
+    return results
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(address):
+    """Return the connection pool shared by all stubs of an address."""
+
+    address = transport.normalize(address)
+    with _pools_lock:
+        pool = _pools.get(address)
+        if pool is None:
+            pool = ConnectionPool(address)
+            _pools[address] = pool
+        return pool
+
+
+def _after_fork():
+    """Forget the state inherited from the parent in a forked child.
+
+    The pooled connections belong to the parent, and the locks may have
+    been held by threads that do not exist in the child.
+
+    """
+
+    global _pools_lock, _executor, _control_executor, _executor_lock
+    global client_stats
+    _pools.clear()
+    _pools_lock = threading.Lock()
+    _executor = None
+    _control_executor = None
+    _executor_lock = threading.Lock()
+    client_stats = stats.Statistics()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
 class Stub(object):
 
     """ Stub for generic objects distributed over the network.
 
-    This is  wrapper object for a socket.
+    This is  wrapper object for a socket. Connections are taken from a
+    pool shared by all the stubs of the same address. Stubs of inproc
+    addresses call the skeleton directly instead: the arguments and
+    results are passed by reference, and timeouts do not apply.
+
+    Calls give up after timeout seconds (no limit when None) and raise
+    DeadlineExceeded.
+
+    Calls to the methods listed in oneway, and calls made through
+    notify, are one-way: they return as soon as the request is sent and
+    the remote object sends no reply. A failure to deliver such a call
+    is passed to on_error(method, args, error) when on_error is given,
+    and raised otherwise.
+
+    Calls rejected with Overloaded by a busy remote object are tried
+    again up to retries times, after a random delay (see retry_delay),
+    as long as their timeout is not over.
 
     """
 
-    def __init__(self, address):
-        self.address = tuple(address)
+    def __init__(self, address, oneway=(), on_error=None, timeout=None,
+                 retries=RETRIES, backoff=RETRY_BACKOFF):
+        self.address = transport.normalize(address)
+        self.pool = None
+        if not transport.is_local(self.address):
+            self.pool = get_pool(self.address)
+        self.oneway = frozenset(oneway)
+        self.on_error = on_error
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
 
 
     def check_if_error(self, data):
-        if "error" in data:
-            errorInfo = data["error"]
-            errorName = type(errorInfo["name"], (Exception,), {})
-            errorArgs = tuple(errorInfo["args"])
-            raise errorName(*errorArgs)
-            #return data["error"]
-        else:
-            return data["result"]
+        if "stream" in data:
+            return RemoteIterator(self, data["stream"])
+        return check_if_error(data)
+
+    def is_legacy(self):
+        """Tell whether the other end only speaks JSON lines."""
+        return self.pool is not None and self.pool.legacy
+
+    def _acquire(self, timeout):
+        try:
+            return self.pool.acquire(timeout)
+        except socket.timeout:
+            notify_failure(self.address)
+            raise DeadlineExceeded(
+                "Cannot connect to {} within {} seconds".format(
+                    self.address, timeout))
+        except (OSError, CommunicationError):
+            notify_failure(self.address)
+            raise
+
+    def _exchange(self, message, timeout=None, oneway=False,
+                  requested=None):
+        """Send a message on a pooled connection and return the reply.
+
+        The time left until the deadline of the call is sent along with
+        the message, so that the other end can drop it once the caller
+        has given up. One-way messages get no reply (None is returned),
+        except on connections still using JSON lines.
+
+        requested is the timeout asked for by the caller, reported when
+        the call times out, if timeout is only what is left of it.
+
+        """
+
+        if self.pool is None:
+            return self._exchange_local(message, oneway)
+        method = message["method"]
+        if timeout is None:
+            timeout = self.timeout
+        if requested is None:
+            requested = timeout
+        begin = time.perf_counter()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    client_stats.record(method, time.perf_counter() - begin,
+                                        True)
+                    raise DeadlineExceeded(
+                        "No reply to '{}' within {} seconds".format(
+                            method, requested))
+                if not oneway:
+                    # Nobody waits for a one-way call: it never expires.
+                    message["timeout"] = remaining
+            conn = self._acquire(remaining)
+            reply = None
+            received = 0
+            sent = None
+            try:
+                conn.sock.settimeout(remaining)
+                sent = conn.send(message)
+                if not oneway or conn.codec is None:
+                    reply = conn.receive()
+                    received = conn.received
+            except socket.timeout:
+                self.pool.discard(conn)
+                client_stats.record(method, time.perf_counter() - begin,
+                                    True)
+                notify_failure(self.address)
+                raise DeadlineExceeded(
+                    "No reply to '{}' within {} seconds".format(
+                        method, requested))
+            except (OSError, CommunicationError):
+                self.pool.discard(conn)
+                # A pooled connection may have been closed by the other
+                # end just before we used it, so retry on a fresh one,
+                # but only if the request has not been written: the
+                # other end may have run it already.
+                if conn.reused and sent is None:
+                    continue
+                client_stats.record(method, time.perf_counter() - begin,
+                                    True)
+                notify_failure(self.address)
+                raise
+            self.pool.release(conn)
+            client_stats.record(method, time.perf_counter() - begin,
+                                reply is not None and "error" in reply)
+            client_stats.record_bytes(method, received, sent)
+            return reply
+
+    def _exchange_local(self, message, oneway=False):
+        begin = time.perf_counter()
+        try:
+            skeleton = transport.find_local(self.address)
+        except OSError:
+            client_stats.record(message["method"],
+                                time.perf_counter() - begin, True)
+            notify_failure(self.address)
+            raise
+        reply = skeleton.serve_local(message)
+        client_stats.record(message["method"], time.perf_counter() - begin,
+                            reply is not None and "error" in reply)
+        return reply
+
+    def _request(self, message, timeout=None):
+        """Exchange a message, retrying while the other end is overloaded."""
+
+        if timeout is None:
+            timeout = self.timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        attempt = 0
+        while True:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+            reply = self._exchange(message, remaining, requested=timeout)
+            if attempt >= self.retries or not is_overloaded(reply):
+                return reply
+            delay = retry_delay(self.backoff, attempt)
+            if deadline is not None and \
+                    time.monotonic() + delay >= deadline:
+                return reply
+            attempt += 1
+            time.sleep(delay)
 
-    def _rmi(self, method, *args):
+    def _rmi(self, method, *args, timeout=None):
         #
         # Your code here.
         #
+        if method in self.oneway:
+            return self.notify(method, *args)
         jsonData = {"method": method, "args" : args}
-        jsonData = json.dumps(jsonData)
+        return self.check_if_error(self._request(jsonData, timeout))
+
+    def notify(self, method, *args):
+        """Call a method of the remote object without waiting for it."""
+
+        try:
+            reply = self._exchange(
+                {"method": method, "args": args, "oneway": True},
+                oneway=True)
+            if reply is not None:
+                # Peers speaking JSON lines reply to every call.
+                self.check_if_error(reply)
+        except Exception as e:
+            if self.on_error is None:
+                raise
+            self.on_error(method, args, e)
+
+    def call(self, method, *args, timeout=None):
+        """Call a method of the remote object.
+
+        timeout overrides the timeout of the stub for this call.
+
+        """
+
+        return self._rmi(method, *args, timeout=timeout)
+
+    def call_async(self, method, *args, timeout=None, control=False):
+        """Start a call and return a concurrent.futures.Future of it.
+
+        control tells that method is a control method (see
+        get_executor).
+
+        """
+
+        return get_executor(control).submit(self._rmi, method, *args,
+                                            timeout=timeout)
+
+    def batch(self):
+        """Return a Batch collecting calls to be sent in one message."""
 
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.connect(self.address)
-            worker = s.makefile(mode="rw")
-            worker.write(jsonData + "\n")
-            worker.flush()
-            readData = worker.readline()
-            readData = json.loads(readData)
-            return self.check_if_error(readData)
+        return Batch(self)
 
 
     def __getattr__(self, attr):
@@ -80,15 +976,272 @@ class Stub(object):
         return rmi_call
 
 
+class Batch(object):
+
+    """Calls to a remote object sent together in a single message.
+
+    Calls made on a batch return a concurrent.futures.Future right away.
+    The calls are sent as one '__batch__' message when the batch is
+    sent, and the remote object replies with the results of all of them
+    at once. Each future then holds the result or the error of its own
+    call:
+
+        with stub.batch() as batch:
+            first = batch.read()
+            second = batch.read()
+        print(first.result(), second.result())
+
+    Peers that do not know about batches get the calls one by one.
+
+    """
+
+    def __init__(self, stub):
+        self.stub = stub
+        self.calls = []
+
+    # Private methods
+
+    def _send_one_by_one(self):
+        for method, args, future in self.calls:
+            try:
+                future.set_result(self.stub._rmi(method, *args))
+            except Exception as e:
+                future.set_exception(e)
+
+    # Public methods
+
+    def call(self, method, *args):
+        """Queue a call and return the future of its result."""
+
+        future = concurrent.futures.Future()
+        self.calls.append((method, args, future))
+        return future
+
+    def send(self):
+        """Send the queued calls and fill in their futures."""
+
+        calls = [[method, args] for method, args, _ in self.calls]
+        try:
+            if not calls:
+                return
+            if self.stub.is_legacy():
+                self._send_one_by_one()
+                return
+            reply = self.stub._request({"method": "__batch__",
+                                        "args": [calls]})
+            if "error" in reply and self.stub.is_legacy():
+                self._send_one_by_one()
+                return
+            replies = self.stub.check_if_error(reply)
+            for (_, _, future), data in zip(self.calls, replies):
+                try:
+                    future.set_result(self.stub.check_if_error(data))
+                except Exception as e:
+                    future.set_exception(e)
+        except Exception as e:
+            for _, _, future in self.calls:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self.calls = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.send()
+
+    def __getattr__(self, attr):
+        """Queue a call to name, to be sent with the batch."""
+        def batch_call(*args):
+            return self.call(attr, *args)
+        return batch_call
+
+
+class RemoteIterator(object):
+
+    """Iterator over a result streamed by a remote object.
+
+    Remote methods returning a generator reply with the id of a stream
+    instead of a result. The items are then pulled from the other end
+    with '__stream_next__' calls, chunk_size items at a time, so that
+    neither end holds the whole result. The next chunk is asked for as
+    soon as the previous one has arrived.
+
+    An iterator that is not consumed to the end should be closed (or
+    used in a with statement), so that the other end drops the stream.
+
+    """
+
+    def __init__(self, stub, sid, chunk_size=STREAM_CHUNK):
+        self.stub = stub
+        self.sid = sid
+        self.chunk_size = chunk_size
+        self.items = collections.deque()
+        self.done = False
+        self.pending = None
+        self._pull()
+
+    # Private methods
+
+    def _pull(self):
+        self.pending = self.stub.call_async("__stream_next__", self.sid,
+                                            self.chunk_size)
+
+    # Public methods
+
+    def close(self):
+        """Drop the stream at the other end."""
+
+        if self.done:
+            return
+        self.done = True
+        self.items.clear()
+        try:
+            self.stub.call("__stream_close__", self.sid)
+        except (OSError, CommunicationError):
+            pass
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while not self.items:
+            if self.done or self.pending is None:
+                raise StopIteration
+            pending = self.pending
+            self.pending = None
+            try:
+                items, done = pending.result()
+            except Exception:
+                self.done = True
+                raise
+            self.items.extend(items)
+            if done:
+                self.done = True
+            else:
+                self._pull()
+        return self.items.popleft()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class Stream(object):
+
+    """An iterator being pulled by a caller."""
+
+    def __init__(self, iterator):
+        self.iterator = iterator
+        self.error = None
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            if hasattr(self.iterator, "close"):
+                self.iterator.close()
+
+
+class StreamTable(object):
+
+    """The streams of the results of a skeleton, indexed by id.
+
+    Streams that nobody has pulled from for timeout seconds are dropped,
+    so that callers that died do not leave their streams behind.
+
+    """
+
+    def __init__(self, timeout=STREAM_TIMEOUT):
+        self.timeout = timeout
+        self.streams = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    # Private methods
+
+    def _find(self, sid):
+        with self.lock:
+            stream = self.streams.get(sid)
+        if stream is None:
+            raise StreamClosed("No stream with id {}".format(sid))
+        return stream
+
+    def _drop(self, sid):
+        with self.lock:
+            return self.streams.pop(sid, None)
+
+    # Public methods
+
+    def open(self, iterator):
+        """Add an iterator and return the id of its stream."""
+
+        now = time.monotonic()
+        with self.lock:
+            expired = [sid for sid, stream in self.streams.items()
+                       if now - stream.last_used > self.timeout]
+            expired = [self.streams.pop(sid) for sid in expired]
+            sid = next(self.ids)
+            self.streams[sid] = Stream(iterator)
+        for stream in expired:
+            stream.close()
+        return sid
+
+    def next(self, sid, n):
+        """Return the next n items of a stream and whether it has ended."""
+
+        stream = self._find(sid)
+        items = []
+        with stream.lock:
+            if stream.error is not None:
+                self._drop(sid)
+                raise stream.error
+            try:
+                for item in itertools.islice(stream.iterator, n):
+                    items.append(item)
+            except Exception as e:
+                if not items:
+                    self._drop(sid)
+                    raise
+                # Send the items produced before the error first.
+                stream.error = e
+                return [items, False]
+        stream.last_used = time.monotonic()
+        done = len(items) < n
+        if done:
+            self._drop(sid)
+        return [items, done]
+
+    def close(self, sid):
+        """Drop a stream before its end."""
+
+        stream = self._drop(sid)
+        if stream is not None:
+            stream.close()
+
+    def __len__(self):
+        return len(self.streams)
+
+
 class Request(threading.Thread):
 
-    """Run the incoming requests on the owner object of the skeleton."""
+    """Run the incoming requests on the owner object of the skeleton.
+
+    The connection is kept open and serves requests until the caller
+    closes it.
 
-    def __init__(self, owner, conn, addr):
+    """
+
+    def __init__(self, skeleton, conn, addr):
         threading.Thread.__init__(self)
         self.addr = addr
-        self.conn = conn
-        self.owner = owner
+        self.conn = Connection(conn)
+        self.conn.client = client_key(addr)
+        self.skeleton = skeleton
         self.daemon = True
 
     def run(self):
@@ -96,68 +1249,600 @@ class Request(threading.Thread):
         # Your code here.
         #
         try:
-            worker = self.conn.makefile(mode="rw")
-            request = worker.readline()
-            request = json.loads(request)
-
-            try:
-                method = request.get("method")
-                args = tuple(request.get("args"))
-                method_result = getattr(self.owner, method)(*args)
-                result = {
-                    "result": method_result
-                }
-
-            except Exception as e:
-                result = {
-                    "error" : {
-                        "name": type(e).__name__,
-                        "args": e.args
-                    }
-                }
-            finally:
-                result = json.dumps(result)
-            worker.write(result + "\n")
-            worker.flush()
+            while True:
+                try:
+                    request = self.conn.receive()
+                except ConnectionClosed:
+                    break
+                if not self.skeleton.admit(self.conn, request):
+                    continue
+                try:
+                    self.skeleton.serve(self.conn, request)
+                finally:
+                    self.skeleton.finish(self.conn, request)
         except Exception as e:
             print("The connection to the caller has died:")
             print("\t{}: {}".format(type(e), e))
         finally:
             self.conn.close()
 
+
 class Skeleton(threading.Thread):
 
     """ Skeleton class for a generic owner.
 
     This is used to listen to an address of the network, manage incoming
-    connections and forward calls to the generic owner class.
+    connections and forward calls to the generic owner class. Skeletons
+    of inproc addresses listen to nothing: their stubs run the calls in
+    their own threads.
+
+    By default every connection is served by its own Request thread.
+    When a number of workers is given, the skeleton instead watches all
+    the connections itself and puts the incoming requests in a bounded
+    queue served by a fixed pool of worker threads. Requests arriving
+    while the queue is full are rejected with an Overloaded error.
+
+    Requests beyond max_requests in progress at once, or beyond
+    max_per_client from the same caller, are rejected right away with
+    an Overloaded error as well, before anything waits or runs for
+    them (see the admission module). The owner may put its methods in
+    priority classes with a method_priorities attribute mapping method
+    names to 'low', 'normal' or 'high': the low priority requests are
+    the first to be turned away.
+
+    The entries of the dispatch table of the owner marked with control
+    are control methods. They are in the high priority class unless
+    method_priorities says otherwise, and with a pool of workers they
+    skip the request queue: up to control_workers threads of their own
+    serve them. Their handlers may thus call other peers, which call
+    back, without waiting for the workers busy with client calls.
+
+    Only the methods exported by the owner (see export_methods) can be
+    called. The table of exported methods is built when the skeleton
+    starts. Methods returning a generator have their results streamed
+    to the caller (see RemoteIterator).
+
+    The skeleton keeps statistics of the calls it serves. They can be
+    fetched, together with those of the stubs of this process, with the
+    built-in '__stats__' call, and are appended every stats_interval
+    seconds to stats_file when one is given.
+
+    With processes > 1, the skeleton forks processes - 1 children when
+    it starts, all accepting connections on the same address (see
+    _fork). The children run the methods listed in the read_only_methods
+    attribute of the owner on their copy of it, and forward all the
+    other calls to the parent, which keeps the only up-to-date state of
+    the owner. Each process answers '__stats__' with its own statistics.
 
     """
 
-    def __init__(self, owner, address):
+    def __init__(self, owner, address, workers=0, backlog=socket.SOMAXCONN,
+                 queue_size=1024, stats_file=None, stats_interval=10.0,
+                 processes=1, max_requests=None, max_per_client=None,
+                 control_workers=CONTROL_WORKERS):
         threading.Thread.__init__(self)
-        self.address = address
+        self.address = transport.normalize(address)
         self.owner = owner
         self.daemon = True
+        self.workers = workers
+        self.control_workers = control_workers
+        self.backlog = backlog
+        self.processes = processes
+        self.children = []
+        self.parent = None
+        self.child_methods = frozenset()
+        self.methods = {}
+        self.control_methods = frozenset()
+        self.streams = StreamTable()
+        self.stats = stats.Statistics()
+        self.admission = admission.AdmissionControl(max_requests,
+                                                    max_per_client)
+        self.stats_dumper = None
+        if stats_file is not None:
+            self.stats_dumper = stats.StatsDumper(
+                stats_file, self.get_stats, stats_interval)
         #
         # Your code here.
         #
-        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server.bind(self.address)
-        self.server.listen(1)
+        if transport.is_local(self.address):
+            # Nothing to listen to: stubs call serve_local directly, in
+            # their own threads.
+            self.server = None
+            self.workers = 0
+            self.processes = 1
+            transport.register_local(self.address, self)
+            return
+        if self.processes > 1 and not hasattr(os, "fork"):
+            raise ValueError("Serving from several processes needs fork")
+        self.server = transport.listen(
+            self.address, backlog,
+            self.processes > 1 and transport.can_reuse_port(self.address))
+        if not isinstance(self.address, str) and self.address[1] == 0:
+            # Listening to port 0 picks a free port.
+            self.address = (self.address[0], self.server.getsockname()[1])
+        self.listeners = [self.server]
+        if self.workers > 0:
+            self.requests = queue.Queue(queue_size)
+
+    # Private methods
+
+    def _fork(self):
+        """Start the child processes.
+
+        The parent listens to a private Unix socket as well, through
+        which the children forward the calls they do not run themselves.
+        On TCP the children bind their own socket to the address with
+        SO_REUSEPORT, so that the kernel spreads the connections among
+        the processes; otherwise they accept connections on the socket
+        inherited from the parent.
+
+        A child exits when the parent does, which it notices when the
+        pipe it inherited from the parent is closed.
+
+        """
+
+        directory = tempfile.mkdtemp(prefix="orb-")
+        atexit.register(shutil.rmtree, directory, True)
+        private_address = "unix:" + os.path.join(directory, "parent.sock")
+        private = transport.listen(private_address, self.backlog)
+        alive_r, alive_w = os.pipe()
+        for i in range(self.processes - 1):
+            pid = os.fork()
+            if pid == 0:
+                os.close(alive_w)
+                private.close()
+                self._serve_child(private_address, alive_r)
+            self.children.append(pid)
+        os.close(alive_r)
+        # Kept open (and never written to) for as long as the parent runs.
+        self.alive = alive_w
+        self.listeners.append(private)
+
+    def _serve_child(self, parent_address, alive):
+        """Serve requests in a child process, never returning."""
+
+        try:
+            self.parent = Stub(parent_address)
+            self.stats_dumper = None
+            if transport.can_reuse_port(self.address):
+                self.server.close()
+                self.server = transport.listen(self.address, self.backlog,
+                                               True)
+                self.listeners = [self.server]
+            watcher = threading.Thread(target=self._watch_parent,
+                                       args=(alive,))
+            watcher.daemon = True
+            watcher.start()
+            self.run()
+        except BaseException as e:
+            print("Child process {} has stopped:".format(os.getpid()))
+            print("\t{}: {}".format(type(e), e))
+        finally:
+            os._exit(0)
+
+    def _watch_parent(self, alive):
+        os.read(alive, 1)
+        os._exit(0)
+
+    def _serve_threads(self):
+        for server in self.listeners[1:]:
+            thread = threading.Thread(target=self._accept_loop,
+                                      args=(server,))
+            thread.daemon = True
+            thread.start()
+        self._accept_loop(self.listeners[0])
+
+    def _accept_loop(self, server):
+        while True:
+            try:
+                conn, addr = server.accept()
+                req = Request(self, conn, addr)
+                req.start()
+            except socket.error:
+                continue
+
+    def _serve_pool(self):
+        self.selector = selectors.DefaultSelector()
+        self.resumed = collections.deque()
+        self.wakeup_r, self.wakeup_w = socket.socketpair()
+        self.wakeup_r.setblocking(False)
+        for i in range(self.workers):
+            worker = threading.Thread(target=self._work)
+            worker.daemon = True
+            worker.start()
+        self.control_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.control_workers,
+            thread_name_prefix="orb-control-lane")
+        for server in self.listeners:
+            self.selector.register(server, selectors.EVENT_READ)
+        self.selector.register(self.wakeup_r, selectors.EVENT_READ)
+        while True:
+            for key, _ in self.selector.select():
+                if key.fileobj in self.listeners:
+                    self._accept(key.fileobj)
+                elif key.fileobj is self.wakeup_r:
+                    self._resume()
+                else:
+                    self._read(key.fileobj)
+
+    def _accept(self, server):
+        try:
+            conn, addr = server.accept()
+        except socket.error:
+            return
+        conn = Connection(conn)
+        conn.client = client_key(addr)
+        self.selector.register(conn, selectors.EVENT_READ)
+
+    def _resume(self):
+        """Watch again the connections whose request has been served."""
+
+        try:
+            while self.wakeup_r.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        while self.resumed:
+            conn = self.resumed.popleft()
+            try:
+                request = conn.next_message()
+            except Exception:
+                conn.close()
+                continue
+            if request is not None:
+                self._submit(conn, request)
+            else:
+                self.selector.register(conn, selectors.EVENT_READ)
+
+    def _read(self, conn):
+        try:
+            conn.fill()
+            request = conn.next_message()
+        except Exception:
+            self.selector.unregister(conn)
+            conn.close()
+            return
+        if request is not None:
+            # A connection is not watched while one of its requests is
+            # in progress so that its replies are sent in order.
+            self.selector.unregister(conn)
+            self._submit(conn, request)
+
+    def _submit(self, conn, request):
+        """Queue a request, or answer it right away if it is rejected.
+
+        Called by the thread watching the sockets and by the workers: a
+        request that cannot be handled only closes its connection, as
+        in thread mode.
+
+        """
+
+        try:
+            while request.get("method") == "__codec__":
+                # Answered at once: it only sets up the connection, and
+                # must not be turned away when the queue is full.
+                self.serve(conn, request)
+                request = conn.next_message()
+                if request is None:
+                    self._release(conn)
+                    return
+            if not self.admit(conn, request):
+                self._release(conn)
+                return
+            if request.get("method") in self.control_methods:
+                self.control_executor.submit(self._run, conn, request,
+                                             time.monotonic())
+                return
+            try:
+                self.requests.put_nowait((conn, request, time.monotonic()))
+            except queue.Full:
+                if request.get("oneway"):
+                    # Cannot be turned away (see must_admit): run by the
+                    # threads of the control methods instead.
+                    self.control_executor.submit(self._run, conn, request,
+                                                 time.monotonic())
+                    return
+                self.finish(conn, request)
+                self._reject(conn, request, "Request queue is full ({} "
+                             "pending requests)".format(self.requests.maxsize))
+                self._release(conn)
+        except Exception as e:
+            print("The connection to the caller has died:")
+            print("\t{}: {}".format(type(e), e))
+            conn.close()
+
+    def _reject(self, conn, request, reason):
+        """Answer a request with an Overloaded error without running it."""
+
+        self.stats.record(stats_key(self.methods, request.get("method")),
+                          0.0, True)
+        if request.get("oneway") and conn.codec is not None:
+            print("One-way call to '{}' rejected: {}".format(
+                request.get("method"), reason))
+            return
+        try:
+            conn.send(error_reply(Overloaded(reason)))
+        except OSError:
+            conn.close()
+
+    def _release(self, conn):
+        """Hand a connection back to the thread watching the sockets."""
+
+        self.resumed.append(conn)
+        self.wakeup_w.send(b"\0")
+
+    def _work(self):
+        while True:
+            self._run(*self.requests.get())
+
+    def _run(self, conn, request, arrival):
+        """Serve an admitted request, then the next one of its connection."""
+
+        try:
+            try:
+                self.serve(conn, request, arrival)
+            finally:
+                self.finish(conn, request)
+            request = conn.next_message()
+        except Exception as e:
+            print("The connection to the caller has died:")
+            print("\t{}: {}".format(type(e), e))
+            conn.close()
+            return
+        if request is not None:
+            self._submit(conn, request)
+        else:
+            self._release(conn)
+
+    # Public methods
+
+    def admit(self, conn, request):
+        """Tell whether a request may be served now.
+
+        A request that may not is answered with an Overloaded error
+        right away. Admitted requests must be counted out with finish.
+        The '__codec__' call, which only sets up the connection, is
+        always admitted, and so are the requests that cannot be turned
+        away (see must_admit), which are only counted.
+
+        """
+
+        method = request.get("method")
+        if method == "__codec__":
+            return True
+        reason = self.admission.enter(conn.client, method,
+                                      self.must_admit(request))
+        if reason is None:
+            return True
+        self._reject(conn, request, reason)
+        return False
+
+    def must_admit(self, request):
+        """Tell whether a request may not be turned away.
+
+        Control methods keep the peers going (the lock token travels
+        through them), and the caller of a one-way call would never
+        hear that it was rejected.
+
+        """
+
+        return request.get("method") in self.control_methods or \
+            bool(request.get("oneway"))
+
+    def finish(self, conn, request):
+        """Count out a request admitted by admit."""
+
+        if request.get("method") != "__codec__":
+            self.admission.leave(conn.client)
+
+    def serve(self, conn, request, arrival=None):
+        """Run a request that came on a connection and send the reply.
+
+        The '__codec__' call is answered here since it changes the
+        encoding of the connection it came on. One-way requests get no
+        reply, so their errors are only printed.
+
+        Requests that waited in the queue (since arrival) longer than
+        the timeout given by their caller are not run: the caller has
+        already given up on them. One-way requests have no caller
+        waiting for them, and are always run.
+
+        """
+
+        method = request.get("method")
+        received = conn.received
+        sent = 0
+        timeout = None
+        if not request.get("oneway"):
+            timeout = request.get("timeout")
+        if arrival is not None and timeout is not None and \
+                time.monotonic() - arrival > timeout:
+            error = DeadlineExceeded(
+                "Request to '{}' expired in the queue".format(method))
+            self.stats.record(stats_key(self.methods, method),
+                              time.monotonic() - arrival, True)
+            sent = conn.send(error_reply(error))
+        elif method == "__codec__":
+            name = codec.choose(request.get("args")[0])
+            sent = conn.send({"result": name})
+            if name is not None:
+                conn.codec = codec.codecs[name]
+        elif request.get("oneway") and conn.codec is not None:
+            result = self.process_request(request)
+            if "error" in result:
+                print("One-way call to '{}' failed: {}".format(
+                    method, result["error"]))
+        else:
+            sent = self.send_reply(conn, self.process_request(request))
+        self.stats.record_bytes(stats_key(self.methods, method), received,
+                                sent)
+
+    def send_reply(self, conn, reply):
+        """Send a reply, or the error that prevents it from being sent.
+
+        A result that cannot be encoded, or is too long, is reported to
+        the caller instead of dropping the connection (nothing has been
+        sent yet then; see Connection.send).
+
+        """
+
+        try:
+            return conn.send(reply)
+        except OSError:
+            raise
+        except Exception as e:
+            return conn.send(error_reply(e))
+
+    def serve_local(self, request):
+        """Run a request from a stub of the same process.
+
+        The request is run in the thread of the caller. The reply is
+        returned, or None for one-way requests. Only the overall limits
+        of admission control apply to such requests.
+
+        """
+
+        method = request.get("method")
+        reason = self.admission.enter(None, method, self.must_admit(request))
+        if reason is not None:
+            self.stats.record(stats_key(self.methods, method), 0.0, True)
+            return error_reply(Overloaded(reason))
+        try:
+            result = self.process_request(request)
+        finally:
+            self.admission.leave(None)
+        if request.get("oneway"):
+            if "error" in result:
+                print("One-way call to '{}' failed: {}".format(
+                    request.get("method"), result["error"]))
+            return None
+        return result
+
+    def process_batch(self, calls):
+        """Run the calls of a batch and return all their replies."""
+
+        return [self.process_request({"method": method, "args": args})
+                for method, args in calls]
+
+    def process_request(self, request):
+        """Run a request on the owner and build the reply message."""
+
+        begin = time.perf_counter()
+        method = request.get("method")
+        if self.parent is not None and not self.runs_here(method):
+            result = self.forward(request)
+            self.stats.record(stats_key(self.methods, method),
+                              time.perf_counter() - begin, "error" in result)
+            return result
+        try:
+            args = tuple(request.get("args"))
+            if method == "__batch__":
+                method_result = self.process_batch(*args)
+            elif method == "__stats__":
+                method_result = self.get_stats()
+            elif method == "__stream_next__":
+                method_result = self.streams.next(*args)
+            elif method == "__stream_close__":
+                method_result = self.streams.close(*args)
+            else:
+                method_result = self.find_method(method)(*args)
+            if inspect.isgenerator(method_result):
+                result = stream_reply(self.streams, method_result, request)
+            else:
+                result = {
+                    "result": method_result
+                }
+
+        except Exception as e:
+            result = error_reply(e)
+        self.stats.record(stats_key(self.methods, method),
+                          time.perf_counter() - begin, "error" in result)
+        return result
+
+    def runs_here(self, method):
+        """Tell whether a child process runs a method itself."""
+
+        return method in self.child_methods or method in ("__batch__",
+                                                          "__stats__")
+
+    def forward(self, request):
+        """Pass a request on to the parent process and return its reply."""
+
+        message = {"method": request.get("method"),
+                   "args": request.get("args")}
+        oneway = bool(request.get("oneway"))
+        if oneway:
+            message["oneway"] = True
+        try:
+            reply = self.parent._exchange(message, request.get("timeout"),
+                                          oneway)
+        except Exception as e:
+            return error_reply(e)
+        if reply is None:
+            return {"result": None}
+        return reply
+
+    def find_method(self, method):
+        """Return the exported method with the given name."""
+
+        function = self.methods.get(method)
+        if function is None:
+            raise AttributeError("'{}' object has no exported method '{}'"
+                                 .format(type(self.owner).__name__, method))
+        return function
+
+    def get_stats(self):
+        """Return the statistics of the calls served and made here."""
+
+        return {
+            "address": self.address,
+            "queue_depth": self.queue_depth(),
+            "streams": len(self.streams),
+            "admission": self.admission.snapshot(),
+            "server": self.stats.snapshot(),
+            "client": client_stats.snapshot()
+        }
+
+    def queue_depth(self):
+        """Return the number of requests waiting for a worker."""
+
+        if self.workers > 0:
+            return self.requests.qsize()
+        return 0
+
+    def start(self):
+        """Start serving, after forking the child processes if any."""
+
+        if self.processes > 1 and self.parent is None and not self.children:
+            self._fork()
+        threading.Thread.start(self)
 
     def run(self):
         #
         # Your code here.
         #
+        self.methods = export_methods(self.owner)
+        self.control_methods = frozenset(
+            name for name, method in self.methods.items() if method.control)
+        priorities = {"__stats__": "high"}
+        priorities.update((name, "high") for name in self.control_methods)
+        priorities.update(getattr(self.owner, "method_priorities", {}))
+        self.admission.set_priorities(priorities)
+        # Results streamed by a child could not be pulled through the
+        # other processes, so generators are always run by the parent.
+        self.child_methods = frozenset(
+            name for name in getattr(self.owner, "read_only_methods", ())
+            if name in self.methods and
+            not inspect.isgeneratorfunction(self.methods[name].function))
+        if self.stats_dumper is not None:
+            self.stats_dumper.start()
+        if self.server is None:
+            return
         try:
-            while True:
-                try:
-                    conn, addr = self.server.accept()
-                    req = Request(self.owner, conn, addr)
-                    req.start()
-                except socket.error:
-                    continue
+            if self.workers > 0:
+                self._serve_pool()
+            else:
+                self._serve_threads()
         except KeyboardInterrupt:
             pass
 
@@ -166,14 +1851,19 @@ class Peer:
 
     """Class, extended by objects that communicate over the network."""
 
-    def __init__(self, l_address, ns_address, ptype):
+    # Public methods that remote objects are not allowed to call.
+    local_methods = ("start", "destroy")
+
+    def __init__(self, l_address, ns_address, ptype, **skeleton_options):
         self.type = ptype
         self.hash = ""
         self.id = -1
-        self.address = self._get_external_interface(l_address)
-        self.skeleton = Skeleton(self, self.address)
+        self.skeleton = Skeleton(self, self._get_external_interface(l_address),
+                                 **skeleton_options)
+        self.address = self.skeleton.address
         self.name_service_address = self._get_external_interface(ns_address)
-        self.name_service = Stub(self.name_service_address)
+        self.name_service = nameServiceCache.NameServiceCache(
+            Stub(self.name_service_address))
 
     # Private methods
 
@@ -185,19 +1875,7 @@ class Peer:
 
         """
 
-        addr_name = address[0]
-        if addr_name != "":
-            addrs = socket.gethostbyname_ex(addr_name)[2]
-            if len(addrs) == 0:
-                raise CommunicationError("Invalid address to listen to")
-            elif len(addrs) == 1:
-                addr_name = addrs[0]
-            else:
-                al = [a for a in addrs if a != "127.0.0.1"]
-                addr_name = al[0]
-        addr = list(address)
-        addr[0] = addr_name
-        return tuple(addr)
+        return get_external_interface(address)
 
     # Public methods
 
@@ -211,7 +1889,10 @@ class Peer:
     def destroy(self):
         """Unregister the object before removal."""
 
-        self.name_service.unregister(self.id, self.type, self.hash)
+        try:
+            self.name_service.unregister(self.id, self.type, self.hash)
+        finally:
+            self.name_service.close()
 
     def check(self):
         """Checking to see if the object is still alive."""
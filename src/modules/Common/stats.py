@@ -0,0 +1,160 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Created: 18 October 2026
+#
+# Copyright 2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Per-method call statistics of the ORB.
+
+--  Histogram ::
+        Latency histogram with logarithmic buckets.
+--  Statistics ::
+        Call count, error count, bytes in/out and latency histogram of
+        every method, as seen by one side of the calls.
+--  StatsDumper ::
+        Thread appending snapshots of statistics to a JSON-lines file.
+
+"""
+
+import bisect
+import json
+import math
+import threading
+import time
+
+# Upper bounds (in seconds) of the histogram buckets: four buckets per
+# doubling, from one microsecond to about two minutes.
+BUCKETS = [1e-6 * 2 ** (i / 4.0) for i in range(108)]
+
+
+class Histogram(object):
+
+    """Latency histogram with logarithmic buckets."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        """Return the upper bound of the bucket holding percentile p."""
+
+        if self.total == 0:
+            return 0.0
+        rank = max(1, int(math.ceil(self.total * p / 100.0)))
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) \
+                    else self.max
+        return self.max
+
+
+class MethodStats(object):
+
+    """Statistics of the calls to one method."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.latency = Histogram()
+
+    def snapshot(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "mean": self.latency.sum / self.latency.total
+                    if self.latency.total else 0.0,
+            "p50": self.latency.percentile(50),
+            "p95": self.latency.percentile(95),
+            "p99": self.latency.percentile(99),
+            "max": self.latency.max
+        }
+
+
+class Statistics(object):
+
+    """Call statistics of every method, safe to update from any thread."""
+
+    def __init__(self):
+        self.methods = {}
+        self.lock = threading.Lock()
+
+    # Private methods
+
+    def _method(self, method):
+        stats = self.methods.get(method)
+        if stats is None:
+            stats = self.methods[method] = MethodStats()
+        return stats
+
+    # Public methods
+
+    def record(self, method, seconds, error=False):
+        """Record a finished call and its latency."""
+
+        with self.lock:
+            stats = self._method(method)
+            stats.calls += 1
+            if error:
+                stats.errors += 1
+            stats.latency.add(seconds)
+
+    def record_bytes(self, method, bytes_in, bytes_out):
+        with self.lock:
+            stats = self._method(method)
+            stats.bytes_in += bytes_in
+            stats.bytes_out += bytes_out
+
+    def snapshot(self):
+        """Return the statistics as a dictionary indexed by method."""
+
+        with self.lock:
+            return {method: stats.snapshot()
+                    for method, stats in self.methods.items()}
+
+
+class StatsDumper(threading.Thread):
+
+    """Append snapshots of statistics to a file every interval seconds.
+
+    sources is a function returning the dictionary to be dumped. Each
+    snapshot is written as one JSON line with its time stamp.
+
+    """
+
+    def __init__(self, path, sources, interval=10.0):
+        threading.Thread.__init__(self)
+        self.path = path
+        self.sources = sources
+        self.interval = interval
+        self.daemon = True
+
+    def dump(self):
+        line = dict(self.sources())
+        line["time"] = time.time()
+        with open(self.path, "a") as f:
+            f.write(json.dumps(line) + "\n")
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.dump()
+            except Exception as e:
+                print("Cannot dump the statistics to {}:".format(self.path))
+                print("\t{}: {}".format(type(e), e))
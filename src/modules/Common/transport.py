@@ -0,0 +1,184 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Created: 18 October 2026
+#
+# Copyright 2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Transports carrying the calls of the ORB.
+
+The transport used to reach an object is chosen by the form of its
+address:
+
+--  (host, port) ::
+        TCP socket.
+--  "unix:/path/to/socket" ::
+        Unix domain socket, for objects running on the same machine.
+--  "inproc:name" ::
+        No socket at all: the stub calls the skeleton registered under
+        name in the same process directly, without serializing the
+        messages.
+
+Socket transports are kept in the transports dictionary, indexed by
+scheme, and can be extended with other ones.
+
+"""
+
+import errno
+import os
+import socket
+import stat
+import threading
+
+
+class TcpTransport(object):
+
+    def connect(self, target, timeout=None):
+        sock = socket.create_connection(target, timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def listen(self, target, backlog, reuse_port=False):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        server.bind(target)
+        server.listen(backlog)
+        return server
+
+
+class UnixTransport(object):
+
+    def connect(self, target, timeout=None):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(target)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def listen(self, target, backlog, reuse_port=False):
+        # Unix sockets cannot be bound twice: processes sharing one have
+        # to inherit it.
+        if reuse_port:
+            raise ValueError("Unix sockets cannot be bound several times")
+        # Like SO_REUSEADDR for TCP: a socket file left behind by a dead
+        # server does not prevent a new one from listening. Nobody
+        # accepts connections on such a file; a live server does, and
+        # keeps its address.
+        try:
+            if stat.S_ISSOCK(os.stat(target).st_mode):
+                probe = self.connect(target, 1.0)
+                probe.close()
+                raise OSError(errno.EADDRINUSE,
+                              "Address already in use: '{}'".format(target))
+        except FileNotFoundError:
+            pass
+        except ConnectionRefusedError:
+            os.unlink(target)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(target)
+        server.listen(backlog)
+        return server
+
+
+transports = {
+    "tcp": TcpTransport(),
+    "unix": UnixTransport()
+}
+
+_local = {}
+_local_lock = threading.Lock()
+
+
+def normalize(address):
+    """Return an address in a form usable as a dictionary key.
+
+    Addresses coming from JSON messages are lists; they are turned into
+    tuples. String addresses are returned unchanged.
+
+    """
+
+    if isinstance(address, str):
+        return address
+    return tuple(address)
+
+
+def split(address):
+    """Return the scheme of an address and the target within it."""
+
+    if isinstance(address, str):
+        scheme, sep, target = address.partition(":")
+        if not sep:
+            raise ValueError("Invalid address: '{}'".format(address))
+        return scheme, target
+    return "tcp", tuple(address)
+
+
+def is_local(address):
+    """Tell whether an address is served in this process (inproc)."""
+
+    return isinstance(address, str) and address.startswith("inproc:")
+
+
+def _transport(scheme):
+    transport = transports.get(scheme)
+    if transport is None:
+        raise ValueError("Unknown transport: '{}'".format(scheme))
+    return transport
+
+
+def connect(address, timeout=None):
+    """Open a socket connected to an address."""
+
+    scheme, target = split(address)
+    return _transport(scheme).connect(target, timeout)
+
+
+def listen(address, backlog=socket.SOMAXCONN, reuse_port=False):
+    """Return a socket listening to an address.
+
+    With reuse_port, several sockets (of different processes) can
+    listen to the same address, and the kernel spreads the incoming
+    connections among them.
+
+    """
+
+    scheme, target = split(address)
+    return _transport(scheme).listen(target, backlog, reuse_port)
+
+
+def can_reuse_port(address):
+    """Tell whether several sockets can listen to an address."""
+
+    return split(address)[0] == "tcp" and hasattr(socket, "SO_REUSEPORT")
+
+
+def register_local(address, skeleton):
+    """Make a skeleton reachable in this process under an inproc address."""
+
+    with _local_lock:
+        if address in _local:
+            raise OSError(errno.EADDRINUSE,
+                          "Address already in use: '{}'".format(address))
+        _local[address] = skeleton
+
+
+def unregister_local(address):
+    with _local_lock:
+        _local.pop(address, None)
+
+
+def find_local(address):
+    """Return the skeleton registered under an inproc address."""
+
+    with _local_lock:
+        skeleton = _local.get(address)
+    if skeleton is None:
+        raise ConnectionRefusedError(
+            errno.ECONNREFUSED, "Nothing listens to '{}'".format(address))
+    return skeleton
@@ -27,6 +27,8 @@ The implementation should satisfy the following requests:
         holding the token dies unexpectedly.
 """
 
+from Common import orb
+
 NO_TOKEN = 0
 TOKEN_PRESENT = 1
 TOKEN_HELD = 2
@@ -165,8 +167,11 @@ class DistributedLock(object):
         # Your code here.
         #
         self.peer_list.lock.acquire()
-        self.token[pid] = self.time
-        self.request[pid] = self.time
+        # A peer registered again after being taken for dead may have
+        # asked for the token in the meantime: its request is kept, so
+        # that the token is still handed to it.
+        self.token[pid] = 0
+        self.request.setdefault(pid, 0)
         self.peer_list.lock.release()
 
 
@@ -195,23 +200,21 @@ class DistributedLock(object):
         self.time += 1
         peers = self.peer_list.get_peers()
         if self.state == NO_TOKEN:
-            for peer in peers:
-                try:
-                    if peer != self.owner.id:
-                        tmp_peer = peers[peer]
-                        self.peer_list.lock.release()
-                        tmp_peer.request_token(self.time, self.owner.id)
-                        self.peer_list.lock.acquire()
-                except:
+            others = {pid: peers[pid] for pid in peers
+                      if pid != self.owner.id}
+            request = (self.time, self.owner.id)
+            self.peer_list.lock.release()
+            results = orb.fan_out(others, "request_token", request,
+                                  control=True)
+            for result in results.values():
+                if isinstance(result, Exception):
                     print("Can not tell peer we want the token...")
-                    self.peer_list.lock.acquire()
 
-            self.peer_list.lock.release()
-            while True:
-                self.peer_list.lock.acquire()
-                if self.state == TOKEN_PRESENT:
-                    break
-                self.peer_list.lock.release()
+            # The token is handed to us by obtain_token, which wakes us
+            # up through the condition of the peer list.
+            self.peer_list.lock.acquire()
+            while self.state != TOKEN_PRESENT:
+                self.peer_list.lock.wait()
 
         self.state = TOKEN_HELD
         self.peer_list.lock.release()
@@ -317,6 +320,7 @@ class DistributedLock(object):
         token = self._unprepare(token)
         self.token = token
         self.state = TOKEN_PRESENT
+        self.peer_list.lock.notify_all()
         self.peer_list.lock.release()
 
     def display_status(self):
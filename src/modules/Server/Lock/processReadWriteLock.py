@@ -0,0 +1,71 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Created: 18 October 2026
+#
+# Copyright 2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Class implementing a ReadWriteLock shared by several processes."""
+
+import fcntl
+import os
+from . import readWriteLock
+
+
+class ProcessReadWriteLock(readWriteLock.ReadWriteLock):
+
+    """ReadWriteLock shared by the processes using the same file.
+
+    The threads of a process synchronize as with ReadWriteLock. Between
+    processes, the readers of a process hold a shared lock (flock) on
+    lock_file for as long as any of them is reading, and a writer holds
+    an exclusive one.
+
+    """
+
+    def __init__(self, lock_file):
+        readWriteLock.ReadWriteLock.__init__(self)
+        self.lock_file = lock_file
+        self.fd = None
+        self.pid = None
+
+    # Private methods
+
+    def _fd(self):
+        # flock locks belong to an open file, which a forked child shares
+        # with its parent: each process opens the file for itself.
+        if self.pid != os.getpid():
+            self.fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+            self.pid = os.getpid()
+        return self.fd
+
+    # Public methods
+
+    def read_acquire(self):
+        self.reader_lock.acquire()
+        try:
+            if self.reader_count == 0:
+                self.writer_lock.acquire()
+                fcntl.flock(self._fd(), fcntl.LOCK_SH)
+            self.reader_count = self.reader_count + 1
+        finally:
+            self.reader_lock.release()
+
+    def read_release(self):
+        self.reader_lock.acquire()
+        try:
+            self.reader_count = self.reader_count - 1
+            if self.reader_count == 0:
+                fcntl.flock(self._fd(), fcntl.LOCK_UN)
+                self.writer_lock.release()
+        finally:
+            self.reader_lock.release()
+
+    def write_acquire(self):
+        self.writer_lock.acquire()
+        fcntl.flock(self._fd(), fcntl.LOCK_EX)
+
+    def write_release(self):
+        fcntl.flock(self._fd(), fcntl.LOCK_UN)
+        self.writer_lock.release()
@@ -0,0 +1,122 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Created: 18 October 2026
+#
+# Copyright 2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Append-only log file with group commit.
+
+The file is kept open. Records appended by concurrent threads are
+gathered into batches, and each batch is written with a single write
+followed by a single fsync. append returns once the record is on disk.
+
+There is no thread of its own: the first thread to append to a batch
+writes it (the leader), while the threads appending after it wait. The
+leader first waits up to delay seconds for more records to join the
+batch, or until max_batch records have joined it: a longer delay makes
+each write slower, but fewer fsyncs are needed for the same number of
+records.
+
+"""
+
+import os
+import threading
+
+# Default longest number of records written together.
+MAX_BATCH = 1024
+
+
+class Batch(object):
+
+    """Records written to the log together."""
+
+    def __init__(self):
+        self.records = []
+        self.done = False
+        self.error = None
+
+
+class CommitLog(object):
+
+    """Append-only log file with group commit.
+
+    With sync=False the batches are written but not fsynced: they
+    survive the process, not the machine.
+
+    """
+
+    def __init__(self, path, delay=0.0, max_batch=MAX_BATCH, sync=True):
+        self.path = path
+        self.delay = delay
+        self.max_batch = max_batch
+        self.sync = sync
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                          0o644)
+        self.batch = Batch()
+        self.writing = False
+        self.batches = 0
+        self.records = 0
+        self.cond = threading.Condition()
+
+    # Private methods
+
+    def _write(self, records):
+        data = memoryview(b"".join(records))
+        while data:
+            data = data[os.write(self.fd, data):]
+        if self.sync:
+            if hasattr(os, "fdatasync"):
+                os.fdatasync(self.fd)
+            else:
+                os.fsync(self.fd)
+
+    # Public methods
+
+    def append(self, record):
+        """Append a record (bytes) and wait until it is on disk.
+
+        The OSError that prevented the batch of the record from being
+        written is raised, if any.
+
+        """
+
+        with self.cond:
+            if self.fd is None:
+                raise ValueError("The log is closed")
+            batch = self.batch
+            batch.records.append(record)
+            if len(batch.records) >= self.max_batch:
+                self.cond.notify_all()
+            while not batch.done:
+                if self.writing:
+                    self.cond.wait()
+                    continue
+                self.writing = True
+                if self.delay and len(batch.records) < self.max_batch:
+                    self.cond.wait(self.delay)
+                # The records appended from now on go to the next batch.
+                self.batch = Batch()
+                self.cond.release()
+                try:
+                    self._write(batch.records)
+                except OSError as e:
+                    batch.error = e
+                finally:
+                    self.cond.acquire()
+                    batch.done = True
+                    self.writing = False
+                    self.batches += 1
+                    self.records += len(batch.records)
+                    self.cond.notify_all()
+            if batch.error is not None:
+                raise batch.error
+
+    def close(self):
+        with self.cond:
+            while self.writing:
+                self.cond.wait()
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
@@ -9,50 +9,295 @@
 
 """Implementation of a simple database class."""
 
+import array
+import bisect
+import mmap
+import os
 import random
+import re
+import struct
+import sys
+import threading
+import zlib
+
+from . import commitLog
+
+# A fortune ends with a line holding only this separator.
+SEPARATOR = re.compile(rb"^%\n", re.MULTILINE)
+
+# Header of an index file: magic, version, size and modification time
+# (in nanoseconds) of the database file when indexed, CRC32 of the last
+# INDEX_SAMPLE bytes indexed and CRC32 of the boundaries that follow.
+INDEX_HEADER = struct.Struct("<4sIQqII")
+INDEX_MAGIC = b"FIDX"
+INDEX_VERSION = 1
+INDEX_SAMPLE = 4096
+
+# The index file is written again once this many fortunes have been
+# added since it was last written.
+INDEX_INTERVAL = 1024
 
 
 class Database(object):
 
-    fortune_list = list()
-    """Class containing a database implementation."""
-    def __init__(self, db_file):
+    """Class containing a database implementation.
+
+    The file is memory-mapped, and only the offsets of the fortunes in
+    it are kept in memory: boundaries[i] is where fortune i starts, and
+    boundaries[i + 1] is where it ends, its separator line included.
+    Fortunes are decoded when they are read, so that opening a large
+    database costs little more than finding its separators.
+
+    When the file is shared with other processes (shared=True), the
+    fortunes they append to it are loaded before each read.
+
+    Unless index is False, the boundaries are saved to an index file
+    next to the database (db_file + '.idx'), so that the next time the
+    database is opened only the bytes appended since then are scanned.
+    The index is used only if the database has not shrunk and the last
+    bytes it covers are unchanged; otherwise the whole file is scanned
+    again. It is written again every INDEX_INTERVAL new fortunes.
+
+    With log=True, the file is kept open as an append-only log (see
+    commitLog): concurrent writes are grouped into one write and one
+    fsync, after waiting up to commit_delay seconds for more of them,
+    and write returns once its fortune is on disk. Writes then need no
+    lock against each other or against reads.
+
+    """
+    def __init__(self, db_file, shared=False, index=True, log=False,
+                 commit_delay=0.0):
         self.db_file = db_file
+        self.shared = shared
+        self.index_file = db_file + ".idx" if index else None
         self.rand = random.Random()
         self.rand.seed()
+        self.mapping = None
+        self.size = 0
+        self.mtime = 0
+        self.boundaries = array.array("Q", [0])
+        self.saved = 0
+        self.lock = threading.Lock()
+        self.log = None
+        if log:
+            self.log = commitLog.CommitLog(db_file, commit_delay)
         #
         # Your code here.
         #
-        temporary_string = ""
+        if self.index_file is not None:
+            self.load_index()
+        self.refresh()
+        if self.index_file is not None and self.mapping is not None and \
+                len(self.boundaries) != self.saved:
+            self._save_index()
+
+    # Private methods
+
+    def _sample(self, mapping, size):
+        return zlib.crc32(mapping[max(0, size - INDEX_SAMPLE):size])
+
+    def _save_index(self):
+        """Write the index file, replacing the previous one at once."""
+
+        boundaries = self.boundaries
+        if sys.byteorder != "little":
+            boundaries = array.array("Q", boundaries)
+            boundaries.byteswap()
+        payload = boundaries.tobytes()
+        header = INDEX_HEADER.pack(
+            INDEX_MAGIC, INDEX_VERSION, self.size, self.mtime,
+            self._sample(self.mapping, self.size), zlib.crc32(payload))
+        temporary = "{}.{}.tmp".format(self.index_file, os.getpid())
+        try:
+            with open(temporary, "wb") as file:
+                file.write(header)
+                file.write(payload)
+            os.replace(temporary, self.index_file)
+        except OSError as e:
+            print("Cannot write the index of the database:")
+            print("\t{}: {}".format(type(e), e))
+            return
+        self.saved = len(self.boundaries)
+
+    def _fortune(self, mapping, i):
+        begin = self.boundaries[i]
+        end = self.boundaries[i + 1] - len(b"%\n")
+        return mapping[begin:end].decode("utf-8")
+
+    # Public methods
+
+    def refresh(self):
+        """Index the fortunes appended to the file since the last call.
+
+        Only complete fortunes, followed by their separator line, are
+        indexed: a fortune being written by another process is picked up
+        by a later call.
 
-        file = open(db_file, "r+")
+        """
 
-        for line in file:
-            if line != "%\n":
-                temporary_string += line
-            else:
-                self.fortune_list.append(temporary_string)
-                temporary_string = ""
-        file.close()
+        with self.lock:
+            status = os.stat(self.db_file)
+            size = status.st_size
+            if size <= self.size:
+                return
+            with open(self.db_file, "rb") as file:
+                mapping = mmap.mmap(file.fileno(), size,
+                                    access=mmap.ACCESS_READ)
+            # The new mapping is in place before the fortunes in it are
+            # counted, so that readers taking the count first and then
+            # the mapping always find their fortune in it. The previous
+            # mapping is not closed: readers may still be slicing it. It
+            # goes away with the last of them.
+            self.mapping = mapping
+            self.size = size
+            self.mtime = status.st_mtime_ns
+            self.boundaries.extend(
+                match.end() for match in
+                SEPARATOR.finditer(mapping, self.boundaries[-1]))
+            if self.index_file is not None and \
+                    len(self.boundaries) - self.saved >= INDEX_INTERVAL:
+                self._save_index()
+
+    def load_index(self):
+        """Take the boundaries from the index file, if it is still valid.
+
+        Return whether the index file has been used.
+
+        """
+
+        try:
+            with open(self.index_file, "rb") as file:
+                mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            status = os.stat(self.db_file)
+        except (OSError, ValueError):
+            return False
+        with mapping:
+            if len(mapping) < INDEX_HEADER.size:
+                return False
+            magic, version, size, mtime, sample, checksum = \
+                INDEX_HEADER.unpack_from(mapping)
+            payload = mapping[INDEX_HEADER.size:]
+        if magic != INDEX_MAGIC or version != INDEX_VERSION or \
+                zlib.crc32(payload) != checksum or \
+                status.st_size < size or len(payload) % 8:
+            return False
+        if status.st_size > size or status.st_mtime_ns != mtime:
+            # Appended to, or touched: the part indexed must not have
+            # changed.
+            with open(self.db_file, "rb") as file:
+                file.seek(max(0, size - INDEX_SAMPLE))
+                if zlib.crc32(file.read(min(size, INDEX_SAMPLE))) != sample:
+                    return False
+        boundaries = array.array("Q")
+        boundaries.frombytes(payload)
+        if sys.byteorder != "little":
+            boundaries.byteswap()
+        if not boundaries or boundaries[0] != 0 or boundaries[-1] > size:
+            return False
+        with self.lock:
+            # refresh maps the file and scans it from the last boundary.
+            self.boundaries = boundaries
+            self.saved = len(boundaries)
+        return True
+
+    def count(self):
+        """Return the number of fortunes in the database."""
+
+        return len(self.boundaries) - 1
 
     def read(self):
         """Read a random location in the database."""
         #
         # Your code here.
         #
+        if self.shared:
+            self.refresh()
+        count = self.count()
+        mapping = self.mapping
+        if count:
+            return self._fortune(mapping, self.rand.randrange(count))
+
+    def read_many(self, n):
+        """Read n different fortunes, chosen at random.
 
-        if self.fortune_list:
-            return random.choice(self.fortune_list)
+        All the fortunes, in random order, are returned when the database
+        holds fewer than n of them.
 
+        """
+
+        if self.shared:
+            self.refresh()
+        count = self.count()
+        mapping = self.mapping
+        return [self._fortune(mapping, i)
+                for i in self.rand.sample(range(count), min(n, count))]
 
     def write(self, fortune):
         """Write a new fortune to the database."""
         #
         # Your code here.
         #
-        self.fortune_list.append(fortune)
+        if self.log is not None:
+            self.log.append((fortune + "\n%\n").encode("utf-8"))
+        else:
+            file = open(self.db_file, "a+")
+            file.write(fortune)
+            file.write("\n%\n")
+            file.close()
+        self.refresh()
+
+    def write_many(self, fortunes):
+        """Write a list of new fortunes to the database.
+
+        The fortunes are appended with a single write (and, with log=True,
+        a single record of the log), after one another.
+
+        """
+
+        data = "".join(fortune + "\n%\n" for fortune in fortunes)
+        if not data:
+            return
+        if self.log is not None:
+            self.log.append(data.encode("utf-8"))
+        else:
+            file = open(self.db_file, "a+")
+            file.write(data)
+            file.close()
+        self.refresh()
+
+    def close(self):
+        """Close the log, once the writes in progress are on disk."""
+
+        if self.log is not None:
+            self.log.close()
+
+    def fortunes(self, pattern=None):
+        """Iterate over the fortunes, or over those containing pattern.
+
+        Fortunes written after the iteration has started are left out.
+        With a pattern, the encoded pattern is searched for in the file
+        itself, and only the fortunes holding it are decoded (a UTF-8
+        string contains another one exactly when its encoding does).
+
+        """
 
-        file = open(self.db_file, "a+")
-        file.write(fortune)
-        file.write("\n%\n")
-        file.close()
+        count = self.count()
+        mapping = self.mapping
+        if pattern is None:
+            for i in range(count):
+                yield self._fortune(mapping, i)
+            return
+        needle = pattern.encode("utf-8")
+        end = self.boundaries[count]
+        position = 0
+        while position < end:
+            position = mapping.find(needle, position, end)
+            if position < 0:
+                return
+            # The fortune holding the match, which may also have been
+            # the separator of a fortune.
+            i = bisect.bisect_right(self.boundaries, position, 0, count) - 1
+            fortune = self._fortune(mapping, i)
+            if pattern in fortune:
+                yield fortune
+            position = self.boundaries[i + 1]
@@ -0,0 +1,246 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Created: 18 October 2026
+#
+# Copyright 2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Failure detector for the peers of a PeerList.
+
+The peers are pinged (with their 'check' method) in the background, and
+the time since the last answer of each peer is weighed against the
+intervals between its previous answers, as in the phi accrual failure
+detector of Hayashibara et al. phi grows with the time a peer has been
+silent, faster for peers that usually answer regularly:
+
+--  phi >= suspect_phi ::
+        The peer is suspected. Nothing is done apart from marking it.
+--  phi >= dead_phi ::
+        The peer is pinged once more, with a longer timeout. If it still
+        does not answer, it is taken for dead: it is marked as such in
+        the peer list and unregistered from the owner (see
+        unregister_peer), so that the other peers stop calling it.
+
+Dead peers are still pinged. A peer that was only stalled answers
+again, with its id and type, and it is then registered with the owner
+again (see register_peer), as if it had just joined. A dead peer that
+stays silent for FORGET_INTERVALS intervals, or whose address is
+answered by another object, is forgotten.
+
+When a call to one of the peers fails elsewhere in the process, the
+next round starts at once.
+
+"""
+
+import collections
+import math
+import threading
+import time
+
+from Common import orb
+from Common import transport
+
+# Number of intervals between answers the estimate is based on.
+WINDOW = 100
+
+# Thresholds of phi above which a peer is suspected and dead. A phi of
+# 8 means that the peer would have answered by now with a probability
+# of 1 - 1e-8, had it been alive.
+SUSPECT_PHI = 3.0
+DEAD_PHI = 8.0
+
+# Timeout of the last ping before a peer is taken for dead, in ping
+# intervals.
+CONFIRM_INTERVALS = 5
+
+# Time after which a dead peer that does not answer is no longer pinged,
+# in ping intervals.
+FORGET_INTERVALS = 300
+
+
+class ArrivalWindow(object):
+
+    """Intervals between the answers of one peer, and the phi they give."""
+
+    def __init__(self, interval, now, size=WINDOW):
+        self.intervals = collections.deque(maxlen=size)
+        # The expected interval is known before any answer arrives.
+        self.intervals.append(interval)
+        self.min_std = interval / 4.0
+        self.last = now
+
+    def heartbeat(self, now):
+        self.intervals.append(now - self.last)
+        self.last = now
+
+    def phi(self, now):
+        """Return the suspicion level of the peer at time now."""
+
+        n = len(self.intervals)
+        mean = sum(self.intervals) / n
+        variance = sum((x - mean) ** 2 for x in self.intervals) / n
+        std = max(math.sqrt(variance), self.min_std)
+        # Probability that an answer comes later than now, the intervals
+        # being normally distributed.
+        later = 0.5 * math.erfc((now - self.last - mean) /
+                                (std * math.sqrt(2)))
+        if later <= 0.0:
+            return float("inf")
+        return -math.log10(later)
+
+
+class FailureDetector(object):
+
+    """Ping the peers of a peer list and drop the ones that have died.
+
+    owner is the object owning the peer list: its unregister_peer(pid)
+    is called for the dead peers, and its register_peer(pid, address)
+    for the dead peers answering again.
+
+    """
+
+    def __init__(self, owner, peer_list, interval=1.0,
+                 suspect_phi=SUSPECT_PHI, dead_phi=DEAD_PHI):
+        self.owner = owner
+        self.peer_list = peer_list
+        self.interval = interval
+        self.suspect_phi = suspect_phi
+        self.dead_phi = dead_phi
+        self.windows = {}
+        # Time of the last answer (or death) of the dead peers.
+        self.dead_since = {}
+        # Addresses of the peers pinged in the last round.
+        self.addresses = frozenset()
+        self.running = False
+        self.wakeup = threading.Event()
+        self.checker = threading.Thread(target=self._check_loop)
+        self.checker.daemon = True
+
+    # Private methods
+
+    def _check_loop(self):
+        while self.running:
+            try:
+                self.check_all()
+            except Exception as e:
+                print("Failure detection failed: {}: {}".format(type(e), e))
+            # Forget the failures reported by the pings just made.
+            self.wakeup.clear()
+            self.wakeup.wait(self.interval)
+
+    def _connection_failed(self, address):
+        # Called by the thread of the failed call, which may be working
+        # for another one holding the lock of the peer list: the peer is
+        # only looked up by the next round.
+        if transport.normalize(address) in self.addresses:
+            self.wakeup.set()
+
+    # Public methods
+
+    def start(self):
+        """Start pinging the peers."""
+
+        self.running = True
+        orb.add_failure_listener(self._connection_failed)
+        self.checker.start()
+
+    def stop(self):
+        self.running = False
+        orb.remove_failure_listener(self._connection_failed)
+        self.wakeup.set()
+
+    def check_all(self):
+        """Ping all the other peers once and update their state."""
+
+        others = self.peer_list.get_others()
+        dead = self.peer_list.get_dead()
+        self.addresses = frozenset(peer.address for peer in others.values())
+        pinged = dict(dead)
+        pinged.update(others)
+        results = orb.fan_out(pinged, "check", timeout=self.interval,
+                              control=True)
+        now = time.monotonic()
+        for pid in list(self.windows):
+            if pid not in others:
+                del self.windows[pid]
+        for pid in list(self.dead_since):
+            if pid not in dead:
+                del self.dead_since[pid]
+        dying = {}
+        for pid, result in results.items():
+            if pid not in others:
+                self.check_dead(pid, dead[pid].address, result, now)
+                continue
+            window = self.windows.get(pid)
+            if window is None:
+                window = self.windows[pid] = ArrivalWindow(self.interval,
+                                                           now)
+            elif not isinstance(result, Exception):
+                window.heartbeat(now)
+            phi = window.phi(now)
+            if phi >= self.dead_phi:
+                dying[pid] = others[pid]
+            elif phi >= self.suspect_phi:
+                self.peer_list.suspect(pid)
+            else:
+                self.peer_list.trust(pid)
+        if not dying:
+            return
+        results = orb.fan_out(dying, "check",
+                              timeout=self.interval * CONFIRM_INTERVALS,
+                              control=True)
+        now = time.monotonic()
+        for pid, result in results.items():
+            if isinstance(result, Exception):
+                self.declare_dead(pid)
+            else:
+                self.windows[pid].heartbeat(now)
+                self.peer_list.trust(pid)
+
+    def check_dead(self, pid, address, result, now):
+        """Revive or forget a dead peer, from its answer to 'check'."""
+
+        if isinstance(result, Exception):
+            since = self.dead_since.setdefault(pid, now)
+            if now - since < self.interval * FORGET_INTERVALS:
+                return
+        elif (result == [pid, self.owner.type] or
+              result == (pid, self.owner.type)):
+            self.dead_since.pop(pid, None)
+            self.revive(pid, address)
+            return
+        # Silent for too long, or another object took the address.
+        self.dead_since.pop(pid, None)
+        self.peer_list.forget(pid)
+
+    def declare_dead(self, pid):
+        """Drop a dead peer from the peer list and the owner."""
+
+        self.windows.pop(pid, None)
+        self.dead_since[pid] = time.monotonic()
+        self.peer_list.mark_dead(pid)
+        try:
+            self.owner.unregister_peer(pid)
+        except Exception as e:
+            # The peer may have left in the meantime.
+            print("Cannot unregister peer {}: {}: {}".format(
+                pid, type(e), e))
+
+    def revive(self, pid, address):
+        """Register again a peer taken for dead that has answered."""
+
+        print("Peer {} is alive after all.".format(pid))
+        try:
+            self.owner.register_peer(pid, address)
+        except Exception as e:
+            print("Cannot register peer {}: {}: {}".format(
+                pid, type(e), e))
+
+    def phi(self, pid):
+        """Return the current suspicion level of a peer."""
+
+        window = self.windows.get(pid)
+        if window is None:
+            return 0.0
+        return window.phi(time.monotonic())
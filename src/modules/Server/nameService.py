@@ -0,0 +1,204 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Created: 18 October 2026
+#
+# Copyright 2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Implementation of the name service used by the peers.
+
+Objects register with their type and address and receive an id and a
+hash, which they need to unregister. Other objects look them up by type
+(require_all, require_any) or by type and id (require_object).
+
+"""
+
+import random
+import threading
+import time
+import uuid
+
+from Common import orb
+from Common import transport
+
+
+class UnknownObject(Exception):
+    pass
+
+
+class TypeIndex(object):
+
+    """The registered objects of one type.
+
+    The ids are kept in a list, with the position of each id in a
+    dictionary, so that objects can be added, removed and picked at
+    random in constant time.
+
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.positions = {}
+        self.addresses = {}
+
+    def add(self, oid, address):
+        self.positions[oid] = len(self.ids)
+        self.ids.append(oid)
+        self.addresses[oid] = address
+
+    def remove(self, oid):
+        pos = self.positions.pop(oid)
+        last = self.ids.pop()
+        if last != oid:
+            self.ids[pos] = last
+            self.positions[last] = pos
+        del self.addresses[oid]
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class NameService(object):
+
+    """Name service served over the ORB.
+
+    Every check_interval seconds all the registered objects are asked
+    to 'check' themselves. Objects that cannot be reached, or that do
+    not answer with their id and type, are unregistered.
+
+    """
+
+    # Public methods that remote objects are not allowed to call.
+    local_methods = ("start", "destroy", "check_all", "display")
+
+    def __init__(self, address, check_interval=10.0, check_timeout=2.0,
+                 **skeleton_options):
+        self.address = address
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.next_id = 0
+        self.objects = {}
+        self.types = {}
+        self.lock = threading.Lock()
+        self.rand = random.Random()
+        self.rand.seed()
+        self.skeleton = orb.Skeleton(self, address, **skeleton_options)
+        self.checker = threading.Thread(target=self._check_loop)
+        self.checker.daemon = True
+
+    # Private methods
+
+    def _index(self, otype):
+        index = self.types.get(otype)
+        if index is None:
+            raise UnknownObject("No object of type '{}'".format(otype))
+        return index
+
+    def _remove(self, oid):
+        otype, address, ohash = self.objects.pop(oid)
+        index = self.types[otype]
+        index.remove(oid)
+        if len(index) == 0:
+            del self.types[otype]
+
+    def _check_loop(self):
+        while True:
+            time.sleep(self.check_interval)
+            try:
+                self.check_all()
+            except Exception as e:
+                print("Liveness check failed: {}: {}".format(type(e), e))
+
+    # Public methods
+
+    def start(self):
+        """Start serving requests and checking the registered objects."""
+
+        self.skeleton.start()
+        if self.check_interval:
+            self.checker.start()
+
+    def register(self, otype, address):
+        """Register an object and return its id and hash."""
+
+        with self.lock:
+            self.next_id += 1
+            oid = self.next_id
+            ohash = uuid.uuid4().hex
+            address = transport.normalize(address)
+            self.objects[oid] = (otype, address, ohash)
+            index = self.types.get(otype)
+            if index is None:
+                index = self.types[otype] = TypeIndex()
+            index.add(oid, address)
+        return oid, ohash
+
+    def unregister(self, oid, otype, ohash):
+        """Unregister an object, given its id, type and hash."""
+
+        with self.lock:
+            entry = self.objects.get(oid)
+            if entry is None or entry[0] != otype or entry[2] != ohash:
+                raise UnknownObject(
+                    "No object with id {} and type '{}'".format(oid, otype))
+            self._remove(oid)
+
+    def require_all(self, otype):
+        """Return the [id, address] pairs of all objects of a type."""
+
+        with self.lock:
+            index = self.types.get(otype)
+            if index is None:
+                return []
+            return [[oid, index.addresses[oid]] for oid in index.ids]
+
+    def require_any(self, otype):
+        """Return the address of a random object of a type."""
+
+        with self.lock:
+            index = self._index(otype)
+            return index.addresses[self.rand.choice(index.ids)]
+
+    def require_object(self, otype, oid):
+        """Return the address of the object with the given type and id."""
+
+        with self.lock:
+            index = self._index(otype)
+            if oid not in index.addresses:
+                raise UnknownObject(
+                    "No object with id {} and type '{}'".format(oid, otype))
+            return index.addresses[oid]
+
+    def check_all(self):
+        """Unregister the objects that do not answer to 'check'."""
+
+        with self.lock:
+            entries = dict(self.objects)
+        stubs = {oid: orb.Stub(address)
+                 for oid, (otype, address, ohash) in entries.items()}
+        results = orb.fan_out(stubs, "check", (), self.check_timeout)
+        with self.lock:
+            for oid, result in results.items():
+                otype = entries[oid][0]
+                if result == [oid, otype] or result == (oid, otype):
+                    continue
+                if self.objects.get(oid) == entries[oid]:
+                    print("Object {} of type '{}' is dead.".format(oid, otype))
+                    self._remove(oid)
+
+    def check(self):
+        """Checking to see if the name service is still alive."""
+
+        return (0, "name_service")
+
+    def display(self):
+        """Print the registered objects."""
+
+        with self.lock:
+            for otype in sorted(self.types.keys()):
+                print("Type '{}':".format(otype))
+                index = self.types[otype]
+                for oid in sorted(index.ids):
+                    print("    id: {:>2}, address: {}".format(
+                        oid, index.addresses[oid]))
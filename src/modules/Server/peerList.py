@@ -13,14 +13,45 @@ import threading
 from Common import orb
 from Common import objectType
 
+# Calls between peers whose result is never used. They are sent one-way,
+# without waiting for the other peer to run them.
+ONEWAY_METHODS = (
+    "print_message",
+    "register_peer",
+    "unregister_peer",
+    "request_token",
+    "obtain_token",
+    "write_local",
+    "write_local_many"
+)
+
+# Seconds after which a call to another peer is given up, so that a peer
+# that hangs cannot block the others.
+PEER_TIMEOUT = 5.0
+
+
 class PeerList(object):
 
-    """Class that builds a list of objects of the same type as this one."""
+    """Class that builds a list of objects of the same type as this one.
+
+    A failure detector (see failureDetector) may mark the peers that do
+    not answer as suspected, and remove the ones it takes for dead. The
+    removed peers are kept in dead (by id) until they register again, so
+    that the detector can tell when they come back.
+
+    """
 
     def __init__(self, owner):
         self.owner = owner
         self.lock = threading.Condition()
         self.peers = {}
+        self.suspected = set()
+        self.dead = {}
+
+    # Private methods
+
+    def _stub(self, paddr):
+        return orb.Stub(paddr, oneway=ONEWAY_METHODS, timeout=PEER_TIMEOUT)
 
     # Public methods
 
@@ -40,16 +71,16 @@ class PeerList(object):
             # Your code here.
             #
             all_peers = self.owner.name_service.require_all(self.owner.type)
-            self.peers[self.owner.id] = orb.Stub(self.owner.address)
-            for pid, paddr in all_peers:
-                if pid < self.owner.id:
-                    try:
-                        tmp_peer = orb.Stub(paddr)
-                        tmp_peer.register_peer(self.owner.id, self.owner.address)
-                        self.peers[pid] = tmp_peer
-                    except:
-                        print("Failed to connect to peer")
-
+            self.peers[self.owner.id] = self._stub(self.owner.address)
+            lower_peers = {pid: self._stub(paddr)
+                           for pid, paddr in all_peers if pid < self.owner.id}
+            results = orb.fan_out(lower_peers, "register_peer",
+                                  (self.owner.id, self.owner.address))
+            for pid, result in results.items():
+                if isinstance(result, Exception):
+                    print("Failed to connect to peer")
+                else:
+                    self.peers[pid] = lower_peers[pid]
 
         finally:
             self.lock.release()
@@ -63,16 +94,15 @@ class PeerList(object):
             # Your code here.
             #
 
-            pids = sorted(self.peers.keys())
             print(self.owner)
-            for pid in pids:
-                try:
-                    if self.owner.id != pid:
-                        self.peers[pid].unregister_peer(self.owner.id)
-                        del self.peers[pid]
-                except:
-
+            others = {pid: peer for pid, peer in self.peers.items()
+                      if pid != self.owner.id}
+            results = orb.fan_out(others, "unregister_peer", (self.owner.id,))
+            for pid in sorted(results.keys()):
+                if isinstance(results[pid], Exception):
                     print("Could not destroy peer " + str(pid))
+                else:
+                    del self.peers[pid]
 
         finally:
             self.lock.release()
@@ -84,7 +114,9 @@ class PeerList(object):
         # this method in parallel.
         self.lock.acquire()
         try:
-            self.peers[pid] = orb.Stub(paddr)
+            self.peers[pid] = self._stub(paddr)
+            self.suspected.discard(pid)
+            self.dead.pop(pid, None)
             print("Peer {} has joined the system.".format(pid))
         finally:
             self.lock.release()
@@ -98,6 +130,7 @@ class PeerList(object):
         try:
             if pid in self.peers:
                 del self.peers[pid]
+                self.suspected.discard(pid)
                 print("Peer {} has left the system.".format(pid))
             else:
                 raise Exception("No peer with id: '{}'".format(pid))
@@ -114,7 +147,56 @@ class PeerList(object):
             print("List of peers of type '{}':".format(self.owner.type))
             for pid in pids:
                 addr = self.peers[pid].address
-                print("    id: {:>2}, address: {}".format(pid, addr))
+                suspected = " (suspected)" if pid in self.suspected else ""
+                print("    id: {:>2}, address: {}{}".format(pid, addr,
+                                                           suspected))
+            if self.dead:
+                print("Dead peers: {}".format(sorted(self.dead)))
+        finally:
+            self.lock.release()
+
+    def suspect(self, pid):
+        """Mark a peer as suspected of having died."""
+
+        self.lock.acquire()
+        try:
+            if pid in self.peers and pid not in self.suspected:
+                self.suspected.add(pid)
+                print("Peer {} is suspected to have died.".format(pid))
+        finally:
+            self.lock.release()
+
+    def trust(self, pid):
+        """Clear the suspicion on a peer that has answered again."""
+
+        self.lock.acquire()
+        try:
+            if pid in self.suspected:
+                self.suspected.discard(pid)
+                print("Peer {} is alive again.".format(pid))
+        finally:
+            self.lock.release()
+
+    def mark_dead(self, pid):
+        """Mark a peer as dead, before it is unregistered."""
+
+        self.lock.acquire()
+        try:
+            if pid not in self.peers:
+                return
+            self.dead[pid] = self.peers[pid]
+            self.suspected.discard(pid)
+            print("Peer {} has died.".format(pid))
+        finally:
+            self.lock.release()
+
+    def forget(self, pid):
+        """Stop keeping a dead peer that is not coming back."""
+
+        self.lock.acquire()
+        try:
+            if self.dead.pop(pid, None) is not None:
+                print("Peer {} is gone.".format(pid))
         finally:
             self.lock.release()
 
@@ -127,6 +209,25 @@ class PeerList(object):
         finally:
             self.lock.release()
 
+    def get_others(self):
+        """Return a copy of the registered objects, except the owner."""
+
+        self.lock.acquire()
+        try:
+            return {pid: peer for pid, peer in self.peers.items()
+                    if pid != self.owner.id}
+        finally:
+            self.lock.release()
+
+    def get_dead(self):
+        """Return a copy of the objects marked as dead."""
+
+        self.lock.acquire()
+        try:
+            return dict(self.dead)
+        finally:
+            self.lock.release()
+
     def get_peers(self):
         """Return all registered objects."""
 
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Created: 18 October 2026
+#
+# Copyright 2026 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Local name service.
+
+Stand-in for the name service of the course, for running the labs (or
+load tests) without access to it. Point the peers to it by setting the
+TDDD25_NAME_SERVICE environment variable to host:port.
+
+"""
+
+import sys
+import socket
+import argparse
+
+sys.path.append("../modules")
+from Common.nameServiceLocation import name_service_address
+from Server.nameService import NameService
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+if isinstance(name_service_address, str):
+    default_port = 42424
+else:
+    default_port = name_service_address[1]
+
+description = """Name service."""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "-p", "--port", metavar="PORT", dest="port", type=int,
+    default=default_port,
+    help="Set the port to listen to. Default: {}.".format(default_port)
+)
+parser.add_argument(
+    "-u", "--unix", metavar="PATH", dest="unix",
+    help="Listen to the Unix domain socket PATH instead of a TCP port."
+)
+parser.add_argument(
+    "-c", "--check-interval", metavar="SECONDS", dest="check_interval",
+    type=float, default=10.0,
+    help="Check that the registered objects are alive every SECONDS "
+         "seconds, 0 to disable. Default: 10."
+)
+parser.add_argument(
+    "-w", "--workers", metavar="N", dest="workers", type=int, default=8,
+    help="Number of worker threads serving requests. Default: 8."
+)
+opts = parser.parse_args()
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+if opts.unix is not None:
+    address = "unix:" + opts.unix
+else:
+    address = ("", opts.port)
+ns = NameService(address, check_interval=opts.check_interval,
+                 workers=opts.workers)
+ns.start()
+
+if opts.unix is not None:
+    print("Listening to: {}".format(address))
+else:
+    print("Listening to: {}:{}".format(socket.gethostname(), opts.port))
+
+
+def menu():
+    print("""\
+Choose one of the following commands:
+    l  ::  list the registered objects,
+    h  ::  print this menu,
+    q  ::  exit.\
+""")
+
+command = ""
+menu()
+while command != "q":
+    try:
+        sys.stdout.write("Command> ")
+        command = input()
+        if command == "l":
+            ns.display()
+        elif command == "h":
+            menu()
+    except (KeyboardInterrupt, EOFError):
+        break